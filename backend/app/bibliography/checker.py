@@ -1,13 +1,260 @@
 from typing import List, Dict, Any, Optional
 from app.models.data_models import TextBlock, BibliographyEntry
 import re
+import heapq
 import requests
 import time
-from urllib.parse import quote
-import json
+import threading
+from collections import OrderedDict
 from app.services.library_service import library_service
 from app.bibliography.semantic_matcher import semantic_matcher
 import logging
+from functools import lru_cache
+
+# Размер кэша разбора библиографических записей (одни и те же записи разбираются многократно)
+ENTRY_PARSE_CACHE_SIZE = 4096
+
+# Ключевые фразы известных работ для проверки релевантности онлайн-результатов
+_KNOWN_WORK_PHRASES = (
+    'толстой', 'война и мир',  # Для Толстого
+    'экономик', 'анализ данных',  # Для экономики
+    'машинное обучение', 'кнутсен',  # Для ML
+    'бизнес-план', 'предпринимательство'  # Для бизнеса
+)
+# Один проход по тексту находит все фразы сразу, вместо отдельного поиска каждой
+_KNOWN_WORK_RE = re.compile('|'.join(re.escape(p) for p in _KNOWN_WORK_PHRASES))
+
+# Признаки текста, который точно не является библиографией (таблицы, сметы)
+_NOT_BIBLIO_WORDS_RE = re.compile(
+    r'т\.р\.|руб\.|стоимость|цена|закупка|ндс|оборудован|персонал|производств', re.IGNORECASE
+)
+_MONEY_RE = re.compile(r'\d+\s*(?:т\.р\.|руб)')
+_OPERATOR_CHARS_RE = re.compile(r'[+\-*/=]')
+_DIGIT_RE = re.compile(r'\d')
+_TABLE_WORDS_RE = re.compile(r'цена|стоимость|закупка|расход|доход', re.IGNORECASE)
+_TABLE_NUMBERS_RE = re.compile(r'\d+[\s,]*(?:т\.р\.|руб|%)')
+
+# Пороги доли найденных ключевых слов -> уверенность совпадения (по убыванию порога)
+_MATCH_CONFIDENCE_STEPS = ((0.7, 90), (0.5, 75), (0.3, 60), (0.2, 40))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Шаблоны разбора библиографической записи (компилируются один раз при импорте)
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+_SQUARE_BRACKETS_RE = re.compile(r'\[.*?\]')
+_QUERY_JUNK_RE = re.compile(r'[^\w\s.,;:()-]')
+_QUERY_TECH_INFO_RE = re.compile(
+    r'\b(изд-во|издательство|учебник|пособие|монография|статья|под ред|ред\.|с\.|стр\.|т\.|вып\.)\b.*?[.,]',
+    re.IGNORECASE
+)
+_PAGE_NUMBERS_RE = re.compile(r'\d+\.\d+|\d+-\d+')
+# (быстрая проверка подстрокой, шаблон): регулярное выражение запускается, только если подстрока есть в тексте
+_TITLE_TAIL_PATTERNS = tuple((guard, re.compile(p)) for guard, p in (
+    ('//', r'\/\/.*$'),  # Всё после //
+    ('—', r'—.*$'),  # Всё после —
+    ('.—', r'\.—.*$'),  # Всё после .—
+    ('(', r'\(.*\)'),  # Скобки с содержимым
+    ('', r'\b(изд-во|издательство|учебник|пособие|монография|статья)\b.*$'),
+))
+# Разделители конца авторского блока в порядке приоритета
+_AUTHOR_BLOCK_DELIMITERS = ('.', ':', '/')
+_TITLE_END_PATTERNS = tuple(re.compile(p) for p in (
+    r'^([^:]+?)(?=:\s*(?:учебник|пособие|монография|учебное\s+пособие|учебно-методическое))',
+    r'^([^/]+?)(?=/\s*[А-ЯЁA-Z])',  # Перед редакторами
+    r'^([^.]+?)(?=\.\s*—)',  # Перед издательством
+    r'^([^,]+?)(?=,\s*\d{4})',  # Перед годом
+    r'^([^;]+)',  # До точки с запятой
+    r'^([^.]+)',  # До точки
+))
+_EDGE_PUNCT_RE = re.compile(r'^[.,:;\s]+|[.,:;\s]+$')
+_TRAILING_PUNCT_RE = re.compile(r'[.,:;—/]$')
+_HAS_LETTER_RE = re.compile(r'[а-яА-ЯёЁa-zA-Z]')
+_LATIN_INITIAL_RE = re.compile(r'^[A-Z]\.$')
+_DOI_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'doi:\s*([^\s,.;]+)',
+    r'DOI:\s*([^\s,.;]+)',
+    r'https?://doi\.org/([^\s]+)',
+    r'\b10\.\d{4,9}/[^\s]+'
+))
+_ISBN_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'ISBN[\s:-]*([\d\-X]{10,17})',
+    r'ISBN\s+([\d\-X]{10,17})',
+    r'\b[\d\-X]{10,17}\b(?=.*ISBN)',
+))
+# Издательство после "Город:" ищется через str.find (_find_publisher), здесь - только явные указания
+_PUBLISHER_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'изд-во\s+([^.,;]+)',
+    r'издательство\s+([^.,;]+)',
+))
+_JOURNAL_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'//\s*([^.,]+?)(?=\.|,|\s*\d|$)',
+    r'журнал\s+([^.,;]+)',
+))
+_AUTHOR_INITIALS_RE = re.compile(r'[а-яa-z]\.\s*')
+_AUTHOR_COMMA_INITIALS_RE = re.compile(r'([А-ЯЁ][а-яё]+),\s*[А-ЯЁ]\.\s*[А-ЯЁ]\.')
+_AUTHOR_INITIALS_AFTER_RE = re.compile(r'([А-ЯЁ][а-яё]+)\s+[А-ЯЁ]\.[А-ЯЁ]\.')
+_SURNAME_RE = re.compile(r'^[А-ЯЁ][а-яё]+$')
+_AUTHOR_PATTERNS_RU = tuple(re.compile(p) for p in (
+    r'^([А-Я][а-я]+ [А-Я]\.[А-Я]\.)',  # Иванов И.И.
+    r'^([А-Я][а-я]+ [А-Я][а-я]+ [А-Я]\.[А-Я]\.)',  # Иванов Иван И.И.
+    r'^([А-Я][а-я]+,\s*[А-Я]\.[А-Я]\.)',  # Иванов, И.И.
+))
+_AUTHOR_PATTERNS_EN = tuple(re.compile(p) for p in (
+    r'^([A-Z][a-z]+ [A-Z]\.)',  # Smith J.
+    r'^([A-Z][a-z]+ [A-Z]\. [A-Z]\.)',  # Smith J. K.
+    r'^([A-Z][a-z]+,\s*[A-Z]\.)',  # Smith, J.
+))
+_TITLE_AUTHORS_PREFIX_RE = re.compile(
+    r'^[А-ЯЁ][а-яё]+(?:,\s*[А-ЯЁ]\.[А-ЯЁ]\.)?(?:\s+и\s+[А-ЯЁ][а-яё]+(?:,\s*[А-ЯЁ]\.[А-ЯЁ]\.)?)*'
+)
+_TITLE_PATTERNS = tuple(re.compile(p) for p in (
+    r'^([^:/—(]+?)(?=:\s*(?:учебник|пособие|учебное|практикум))',
+    r'^([^:/—(]+?)(?=/\s*[А-ЯЁA-Z])',
+    r'^([^:/—(]+?)(?=—)',
+    r'^([^:/—(]+?)(?=\()',
+))
+_LEADING_INITIALS_RE = re.compile(r'^[А-ЯЁ]\.\s*[А-ЯЁ]\.\s*')
+_WORD_RE = re.compile(r'\w+')
+_CYRILLIC_WORD_RE = re.compile(r'\b[а-яА-ЯёЁ]{4,}\b')
+_NUMBERED_REF_RE = re.compile(r'^\[\d+\]')
+_CITATION_NUMBER_RE = re.compile(r'\[\d+\]')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_INITIAL_RE = re.compile(r'\b[а-я]\.\s*')
+_LETTER_DOT_RE = re.compile(r'\b[а-яё]\.')
+_TITLE_PUNCT_RE = re.compile(r'[.,:;]')
+
+# Признаки библиографической записи (проверяются по тексту в нижнем регистре)
+_BIBLIO_ENTRY_KEYWORDS = (
+    'изд-во', 'издательство', 'журнал', 'т.', 'вып.', 'с.', 'стр.', 'сс.',
+    'университет', 'университета', 'институт', 'академия', 'наук',
+    'издание', 'монография', 'учебник', 'пособие', 'статья',
+    'м.:', 'спб.:', 'киев:', 'минск:',
+    'экономика', 'финансы', 'статистика', 'менеджмент', 'маркетинг'
+)
+_BIBLIO_ABBREVIATIONS = ('т.', 'вып.', 'с.', 'сс.', 'г.')
+
+# Стоп-слова для ключевых слов контекста цитаты
+_CONTEXT_STOP_WORDS = frozenset({
+    'и', 'в', 'на', 'по', 'с', 'из', 'для', 'что', 'как', 'это', 'то', 'же', 'все', 'его', 'их'
+})
+
+
+@lru_cache(maxsize=1024)
+def _normalize_citation_text(text: str) -> str:
+    """Схлопывает пробельные символы в записи (общая очистка для всех разборов записи)"""
+    return ' '.join(text.split())
+
+
+def _strip_author_block(text: str, any_delimiter: Optional[str] = None) -> str:
+    """Отрезает авторский блок в начале записи поиском разделителя через str.find
+
+    По умолчанию блок заканчивается первой точкой, иначе двоеточием, иначе слешем.
+    С any_delimiter блок заканчивается на ближайшем из перечисленных символов.
+    """
+    if any_delimiter is not None:
+        positions = [pos for pos in (text.find(d) for d in any_delimiter) if pos >= 0]
+        return text[min(positions) + 1:].strip() if positions else text.strip()
+
+    for delimiter in _AUTHOR_BLOCK_DELIMITERS:
+        pos = text.find(delimiter)
+        if pos >= 0:
+            return text[pos + 1:].strip()
+    return text
+
+
+def _publisher_after_colon(text: str, colon: int) -> Optional[str]:
+    """Издательство после двоеточия: то же, что r':\\s*([^.,;]+?)(?=\\.|,|;|\\s*\\d|$)' с этой позиции"""
+    text_len = len(text)
+    start = colon + 1
+    i = start
+    while i < text_len and text[i].isspace():
+        i += 1
+    if i == text_len or text[i] in '.,;':
+        # Регулярное выражение отдало бы в группу последний пробел перед разделителем
+        return text[i - 1:i] if i > start else None
+
+    end = i + 1
+    while end < text_len and text[end] not in '.,;':
+        # Граница (?=\s*\d): пробелы и затем цифра
+        k = end
+        while k < text_len and text[k].isspace():
+            k += 1
+        if k < text_len and text[k].isdecimal():
+            break
+        end += 1
+    return text[i:end]
+
+
+def _find_publisher(text: str) -> Optional[str]:
+    """Издательство в записи вида "... — М.: Наука, 2020" через str.find вместо регулярных выражений"""
+    # "— Город: Издательство" (двоеточие после тире)
+    dash = text.find('—')
+    while dash >= 0:
+        colon = text.find(':', dash)
+        if colon < 0:
+            break
+        publisher = _publisher_after_colon(text, colon)
+        if publisher is not None:
+            return publisher
+        dash = text.find('—', colon)
+
+    # Любое ": Издательство"
+    colon = text.find(':')
+    while colon >= 0:
+        publisher = _publisher_after_colon(text, colon)
+        if publisher is not None:
+            return publisher
+        colon = text.find(':', colon + 1)
+
+    # "изд-во ..." / "издательство ..."
+    for pattern in _PUBLISHER_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _starts_with_item_number(text: str) -> bool:
+    """Начинается ли строка с номера пункта списка (от 1. до 99.)"""
+    dot = text.find('.', 0, 3)
+    number = text[:dot]
+    return dot > 0 and number.isascii() and number.isdigit() and number[0] != '0'
+
+
+def _is_word_char(char: str) -> bool:
+    """Символ слова в смысле \\w регулярных выражений"""
+    return char.isalnum() or char == '_'
+
+
+def _find_year(text: str) -> Optional[str]:
+    """Первый год вида 19xx/20xx отдельным словом (как _YEAR_RE.search, но поиском через str.find)"""
+    best = None
+    text_len = len(text)
+    for prefix in ('19', '20'):
+        pos = text.find(prefix)
+        while pos != -1 and (best is None or pos < best):
+            end = pos + 4
+            if (end <= text_len and text[pos + 2:end].isdecimal()
+                    and (pos == 0 or not _is_word_char(text[pos - 1]))
+                    and (end == text_len or not _is_word_char(text[end]))):
+                best = pos
+                break
+            pos = text.find(prefix, pos + 1)
+    return text[best:best + 4] if best is not None else None
+
+
+@lru_cache(maxsize=4096)
+def _clean_title_for_match(text: str) -> str:
+    """Очищает название для сравнения (кэшируется: одни и те же названия сравниваются многократно)"""
+    # Удаляем инициалы типа "а.", "с.", "м."
+    text = _INITIAL_RE.sub('', text)
+    # Удаляем отдельные буквы с точками
+    text = _LETTER_DOT_RE.sub('', text)
+    # Удаляем запятые, точки, двоеточия
+    text = _TITLE_PUNCT_RE.sub('', text)
+    # Удаляем короткие слова (меньше 3 букв)
+    return ' '.join(w for w in text.split() if len(w) > 2).lower()
+
 
 class BibliographyChecker:
     def __init__(self):
@@ -20,6 +267,10 @@ class BibliographyChecker:
         self.library_service = library_service
         self.semantic_matcher = semantic_matcher
         self.logger = logging.getLogger(__name__)
+        # Кэш разбора записей: (вид разбора, нормализованный текст) -> результат
+        self._entry_parse_cache = OrderedDict()
+        # analyze_document выполняется в потоках executor'а - кэш разбора меняем под блокировкой
+        self._entry_parse_cache_lock = threading.Lock()
 
     def _check_authors_strict(self, search_params: Dict, source: Dict) -> bool:
         """Строгая проверка совпадения авторов"""
@@ -124,13 +375,12 @@ class BibliographyChecker:
                 return None
 
             # Выводим первые 5 источников для отладки
-            print(f"      🔎 ПЕРВЫЕ 5 ИСТОЧНИКОВ В БИБЛИОТЕКЕ:")
-            for i, source in enumerate(user_sources[:5]):
-                print(f"        {i + 1}. '{source.get('title', 'No title')}'")
-                print(f"           Авторы: {source.get('authors', [])}")
-                print(f"           Год: {source.get('year')}")
-                if source.get('doi'):
-                    print(f"           DOI: {source.get('doi')}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("🔎 ПЕРВЫЕ 5 ИСТОЧНИКОВ В БИБЛИОТЕКЕ:")
+                for i, source in enumerate(user_sources[:5]):
+                    self.logger.debug("%s. '%s' (авторы: %s, год: %s, DOI: %s)", i + 1,
+                                      source.get('title', 'No title'), source.get('authors', []),
+                                      source.get('year'), source.get('doi'))
 
             best_match = None
             best_score = 0
@@ -154,8 +404,8 @@ class BibliographyChecker:
                     if score > best_score:
                         best_score = score
                         best_match = source
-                        print(f"      🎯 НОВОЕ ЛУЧШЕЕ СОВПАДЕНИЕ: {score} баллов")
-                        print(f"        Название: {source.get('title', 'No title')}")
+                        self.logger.debug("🎯 НОВОЕ ЛУЧШЕЕ СОВПАДЕНИЕ: %s баллов (%s)",
+                                          score, source.get('title', 'No title'))
 
             # Если нашли хотя бы одно совпадение с минимальным порогом
             if best_match and best_score >= 80:
@@ -199,10 +449,10 @@ class BibliographyChecker:
             else:
                 print(f"      ❌ НЕТ ДОСТАТОЧНО ХОРОШИХ СОВПАДЕНИЙ В БИБЛИОТЕКЕ")
                 print(f"      📊 Лучший score: {best_score} (нужно минимум 60)")
-                if all_matches:
-                    print(f"      📈 Все совпадения:")
-                    for match in sorted(all_matches, key=lambda x: x['score'], reverse=True)[:3]:
-                        print(f"        - {match['score']} баллов: {match['source'].get('title')}")
+                if all_matches and self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("📈 Все совпадения:")
+                    for match in heapq.nlargest(3, all_matches, key=lambda x: x['score']):
+                        self.logger.debug("- %s баллов: %s", match['score'], match['source'].get('title'))
                 return None
 
         except Exception as e:
@@ -231,22 +481,18 @@ class BibliographyChecker:
             elif search_title in source_title or source_title in search_title:
                 matched_fields.append('title_partial')
             else:
-                search_words = set(re.findall(r'\w+', search_title))
-                source_words = set(re.findall(r'\w+', source_title))
+                search_words = set(_WORD_RE.findall(search_title))
+                source_words = set(_WORD_RE.findall(source_title))
                 if search_words.intersection(source_words):
                     matched_fields.append('title_words')
 
         if search_params.get('authors') and source.get('authors'):
-            search_authors = [a.lower().strip() for a in search_params['authors'] if a.strip()]
-            source_authors = [a.lower().strip() for a in source['authors'] if a.strip()]
-
-            for search_author in search_authors:
-                search_surname = search_author.split()[0] if search_author.split() else search_author
-                for source_author in source_authors:
-                    source_surname = source_author.split()[0] if source_author.split() else source_author
-                    if search_surname == source_surname:
-                        matched_fields.append('authors')
-                        break
+            # Сравниваем фамилии (первое слово) через пересечение множеств
+            search_surnames = {a.lower().split()[0] for a in search_params['authors'] if a.strip()}
+            source_surnames = {a.lower().split()[0] for a in source['authors'] if a.strip()}
+
+            if not search_surnames.isdisjoint(source_surnames):
+                matched_fields.append('authors')
 
         if search_params.get('year') and source.get('year'):
             if str(search_params['year']) == str(source['year']):
@@ -304,22 +550,16 @@ class BibliographyChecker:
 
         ratio = found / total
 
-        if ratio >= 0.7:
-            return 90
-        elif ratio >= 0.5:
-            return 75
-        elif ratio >= 0.3:
-            return 60
-        elif ratio >= 0.2:
-            return 40
-        else:
-            return 20
+        for threshold, confidence in _MATCH_CONFIDENCE_STEPS:
+            if ratio >= threshold:
+                return confidence
+        return 20
 
     def _calculate_library_match_score(self, source: Dict, search_params: Dict) -> int:
         """Вычисляет оценку совпадения - ИСПРАВЛЕННАЯ"""
         score = 0
 
-        print(f"\n        🔍 Сравниваем с источником: '{source.get('title', 'No title')[:50]}...'")
+        self.logger.debug("🔍 Сравниваем с источником: '%.50s...'", source.get('title', 'No title'))
 
         # Нормализуем данные
         search_title = (search_params.get('title') or '').lower().strip()
@@ -330,34 +570,20 @@ class BibliographyChecker:
         # 2. Проверка названия - ИСПРАВЛЕННАЯ ЛОГИКА
         if search_title and source_title:
             # Убираем ВСЕ инициалы, точки, запятые и короткие слова
-            def clean_text(text):
-                # Удаляем инициалы типа "а.", "с.", "м."
-                text = re.sub(r'\b[а-я]\.\s*', '', text)
-                # Удаляем отдельные буквы с точками
-                text = re.sub(r'\b[а-яё]\.', '', text)
-                # Удаляем запятые, точки, двоеточия
-                text = re.sub(r'[.,:;]', '', text)
-                # Удаляем короткие слова (меньше 3 букв)
-                words = text.split()
-                words = [w for w in words if len(w) > 2]
-                return ' '.join(words).lower()
-
-            clean_search = clean_text(search_title)
-            clean_source = clean_text(source_title)
-
-            print(f"        🔧 Очищенные заголовки:")
-            print(f"           Ищем: '{clean_search}'")
-            print(f"           В: '{clean_source}'")
+            clean_search = _clean_title_for_match(search_title)
+            clean_source = _clean_title_for_match(source_title)
+
+            self.logger.debug("🔧 Очищенные заголовки: ищем '%s' в '%s'", clean_search, clean_source)
 
             # Точное совпадение после очистки
             if clean_search == clean_source:
                 score += 70
-                print(f"        ✅ ТОЧНОЕ СОВПАДЕНИЕ НАЗВАНИЯ (после очистки) (+70)")
+                self.logger.debug("✅ ТОЧНОЕ СОВПАДЕНИЕ НАЗВАНИЯ (после очистки) (+70)")
 
             # Одно содержит другое
             elif clean_search in clean_source or clean_source in clean_search:
                 score += 60
-                print(f"        ✅ ЧАСТИЧНОЕ СОВПАДЕНИЕ НАЗВАНИЯ (+60)")
+                self.logger.debug("✅ ЧАСТИЧНОЕ СОВПАДЕНИЕ НАЗВАНИЯ (+60)")
 
             # Совпадение ключевых слов (только длинных!)
             else:
@@ -371,44 +597,38 @@ class BibliographyChecker:
                 if significant_common:
                     keyword_score = len(significant_common) * 20
                     score += keyword_score
-                    print(f"        ✅ ОБЩИЕ КЛЮЧЕВЫЕ СЛОВА: {significant_common} (+{keyword_score})")
+                    self.logger.debug("✅ ОБЩИЕ КЛЮЧЕВЫЕ СЛОВА: %s (+%s)", significant_common, keyword_score)
                 else:
                     # Незначительные совпадения (инициалы и т.д.) - НЕ ДАЕМ БАЛЛОВ!
-                    print(f"        ⚠ Незначительные совпадения: {common_words} (0 баллов)")
+                    self.logger.debug("⚠ Незначительные совпадения: %s (0 баллов)", common_words)
 
         # 3. Проверка авторов - САМОЕ ВАЖНОЕ!
         if search_params.get('authors') and source.get('authors'):
             search_authors = [a.lower().strip() for a in search_params['authors'] if a and len(a) > 2]
             source_authors = [a.lower().strip() for a in source['authors'] if a and len(a) > 2]
 
-            print(f"        🔍 Сравнение авторов:")
-            print(f"          Ищем: {search_authors}")
-            print(f"          В: {source_authors}")
+            self.logger.debug("🔍 Сравнение авторов: ищем %s в %s", search_authors, source_authors)
 
             # Убираем дубликаты
             search_authors = list(set(search_authors))
             source_authors = list(set(source_authors))
 
-            author_matches = 0
-            for search_author in search_authors:
-                for source_author in source_authors:
-                    # Нормализуем: убираем точки, инициалы
-                    norm_search = self._normalize_author_name(search_author)
-                    norm_source = self._normalize_author_name(source_author)
-
-                    if norm_search and norm_source and norm_search == norm_source:
-                        author_matches += 1
-                        print(f"        ✅ ТОЧНОЕ СОВПАДЕНИЕ АВТОРА: {search_author} == {source_author}")
-                        break
+            # Нормализуем (убираем точки, инициалы) один раз на автора и сравниваем через множество
+            source_norms = {self._normalize_author_name(a) for a in source_authors}
+            source_norms.discard('')
+            matched_authors = [a for a in search_authors if self._normalize_author_name(a) in source_norms]
+            author_matches = len(matched_authors)
+            if matched_authors:
+                self.logger.debug("✅ ТОЧНОЕ СОВПАДЕНИЕ АВТОРОВ: %s", matched_authors)
 
             # ВЕС авторов должен быть ВЫШЕ, чем вес заголовка!
             if author_matches > 0:
                 score += author_matches * 50  # 50 баллов за каждого совпавшего автора
-                print(f"        📊 Авторских совпадений: {author_matches} (+{author_matches * 50} баллов)")
+                self.logger.debug("📊 Авторских совпадений: %s (+%s баллов)", author_matches, author_matches * 50)
             else:
                 # Если авторы НЕ совпадают - СИЛЬНЫЙ ШТРАФ
                 score -= 40
-                print(f"        ❌ АВТОРЫ НЕ СОВПАДАЮТ! (-40)")
+                self.logger.debug("❌ АВТОРЫ НЕ СОВПАДАЮТ! (-40)")
 
         # 4. Проверка года
         if search_params.get('year') and source.get('year'):
@@ -416,139 +636,29 @@ class BibliographyChecker:
             source_year = str(source['year']).strip()
             if search_year == source_year:
                 score += 20
-                print(f"        ✅ СОВПАДЕНИЕ ГОДА: {search_year} (+20)")
+                self.logger.debug("✅ СОВПАДЕНИЕ ГОДА: %s (+20)", search_year)
             else:
                 score -= 15
-                print(f"        ❌ НЕСОВПАДЕНИЕ ГОДА: {search_year} != {source_year} (-15)")
+                self.logger.debug("❌ НЕСОВПАДЕНИЕ ГОДА: %s != %s (-15)", search_year, source_year)
 
-        print(f"        📊 ИТОГОВЫЙ SCORE: {score} баллов")
+        self.logger.debug("📊 ИТОГОВЫЙ SCORE: %s баллов", score)
         return max(score, 0)  # Не меньше 0
 
-    def _extract_search_params_from_entry(self, entry_text: str) -> Dict[str, Any]:
-        """Извлекает параметры поиска из библиографической записи - УЛУЧШЕННАЯ ВЕРСИЯ"""
-        # Очищаем текст
-        clean_text = re.sub(r'\s+', ' ', entry_text.strip())
-        print(f"\n        📝 Оригинальный текст: '{clean_text}'")
-
-        # 1. Сначала пытаемся извлечь полное название (новый метод)
-        full_title = self._extract_complete_title(clean_text)
-
-        # 2. Если не удалось, используем старый метод
-        if not full_title:
-            full_title = self._extract_title(clean_text)
-
-        # 3. Извлекаем авторы
-        authors = self._extract_authors(clean_text)
-
-        # 4. Извлекаем год
-        year = self._extract_year(clean_text)
-
-        # 5. Остальные параметры остаются без изменений
-        doi = None
-        isbn = None
-        publisher = None
-        journal = None
-
-        # Извлекаем DOI
-        doi_patterns = [
-            r'doi:\s*([^\s,.;]+)',
-            r'DOI:\s*([^\s,.;]+)',
-            r'https?://doi\.org/([^\s]+)',
-            r'\b10\.\d{4,9}/[^\s]+'
-        ]
-        for pattern in doi_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
-            if match:
-                doi = match.group(1).strip()
-                break
-
-        # Извлекаем ISBN
-        isbn_patterns = [
-            r'ISBN[\s:-]*([\d\-X]{10,17})',
-            r'ISBN\s+([\d\-X]{10,17})',
-            r'\b[\d\-X]{10,17}\b(?=.*ISBN)',
-        ]
-        for pattern in isbn_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
-            if match:
-                isbn = match.group(1).strip()
-                break
-
-        # Извлекаем издательство
-        publisher_patterns = [
-            r'—\s*[^:]*:\s*([^.,;]+?)(?=\.|,|;|\s*\d|$)',
-            r':\s*([^.,;]+?)(?=\.|,|;|\s*\d|$)',
-            r'изд-во\s+([^.,;]+)',
-            r'издательство\s+([^.,;]+)',
-        ]
-        for pattern in publisher_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
-            if match:
-                publisher = match.group(1).strip()
-                break
-
-        # Извлекаем журнал
-        journal_patterns = [
-            r'//\s*([^.,]+?)(?=\.|,|\s*\d|$)',
-            r'журнал\s+([^.,;]+)',
-            r'Журнал\s+([^.,;]+)',
-        ]
-        for pattern in journal_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
-            if match:
-                journal = match.group(1).strip()
-                break
-
-        result = {
-            'title': full_title,
-            'authors': authors,
-            'year': year,
-            'doi': doi,
-            'isbn': isbn,
-            'publisher': publisher,
-            'journal': journal,
-            'original_text': clean_text
-        }
-
-        print(f"        📊 Параметры поиска:")
-        print(f"          📖 Заголовок: {full_title}")
-        print(f"          👥 Авторы: {authors}")
-        print(f"          📅 Год: {year}")
-        print(f"          🔗 DOI: {doi}")
-        print(f"          📘 ISBN: {isbn}")
-        print(f"          🏢 Издательство: {publisher}")
-        print(f"          📰 Журнал: {journal}")
-
-        return result
-
     def _extract_complete_title(self, text: str) -> Optional[str]:
         """Извлекает полное название работы из библиографической записи"""
         if not text:
             return None
 
         # Очищаем текст
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = _normalize_citation_text(text)
 
         print(f"        🔍 Извлекаем полный заголовок из: '{text[:100]}...'")
 
         # 1. Пытаемся найти название между авторами и технической информацией
         # Паттерн: авторы [название] : тип / редакторы и т.д.
 
-        # Убираем авторов (все до первой точки, двоеточия или года)
-        text_without_authors = text
-
-        # Ищем конец авторского блока
-        author_end_patterns = [
-            r'^[^.]*\.\s*',  # Заканчивается точкой
-            r'^[^:]*:\s*',  # Заканчивается двоеточием
-            r'^[^/]*/\s*',  # Заканчивается слешем
-        ]
-
-        for pattern in author_end_patterns:
-            match = re.match(pattern, text)
-            if match:
-                text_without_authors = text[len(match.group(0)):].strip()
-                break
+        # Убираем авторов (все до первой точки, двоеточия или слеша)
+        text_without_authors = _strip_author_block(text)
 
         # 2. Теперь ищем конец названия
         # Название обычно заканчивается перед:
@@ -557,28 +667,18 @@ class BibliographyChecker:
         # - ". — " (издательство)
         # - ", " (продолжение описания)
 
-        title_end_patterns = [
-            r'^([^:]+?)(?=:\s*(?:учебник|пособие|монография|учебное\s+пособие|учебно-методическое))',
-            r'^([^/]+?)(?=/\s*[А-ЯЁA-Z])',  # Перед редакторами
-            r'^([^.]+?)(?=\.\s*—)',  # Перед издательством
-            r'^([^,]+?)(?=,\s*\d{4})',  # Перед годом
-            r'^([^;]+)',  # До точки с запятой
-            r'^([^.]+)',  # До точки
-        ]
-
-        for pattern in title_end_patterns:
-            match = re.search(pattern, text_without_authors)
+        for pattern in _TITLE_END_PATTERNS:
+            match = pattern.search(text_without_authors)
             if match:
                 title = match.group(1).strip()
                 # Очищаем от лишних символов
-                title = re.sub(r'^[.,:;\s]+', '', title)
-                title = re.sub(r'[.,:;\s]+$', '', title)
+                title = _EDGE_PUNCT_RE.sub('', title)
 
                 if title and len(title) > 5:
                     # Проверяем, что это не слишком короткий и не технический текст
                     if (len(title) >= 10 and
                             not any(word in title.lower() for word in ['т.', 'вып.', 'с.', 'г.', 'изд-во']) and
-                            re.search(r'[а-яА-ЯёЁa-zA-Z]', title)):
+                            _HAS_LETTER_RE.search(title)):
                         print(f"        ✅ Найден полный заголовок: '{title}'")
                         return title
 
@@ -591,8 +691,8 @@ class BibliographyChecker:
             # Пропускаем короткие и служебные слова
             if (len(word) > 2 and
                     not word.lower() in ['под', 'ред', 'ред.', 'изд-во', 'издательство'] and
-                    not re.match(r'^[A-Z]\.$', word) and  # Пропускаем инициалы
-                    not re.match(r'^\d+$', word)):  # Пропускаем числа
+                    not _LATIN_INITIAL_RE.match(word) and  # Пропускаем инициалы
+                    not word.isdigit()):  # Пропускаем числа
                 meaningful_words.append(word)
 
             if len(meaningful_words) >= 8:
@@ -601,7 +701,7 @@ class BibliographyChecker:
         if meaningful_words:
             title = ' '.join(meaningful_words)
             # Очищаем от технических символов
-            title = re.sub(r'[.,:;—/]$', '', title).strip()
+            title = _TRAILING_PUNCT_RE.sub('', title).strip()
 
             if len(title) > 10:
                 print(f"        📝 Заголовок из первых слов: '{title}'")
@@ -631,46 +731,6 @@ class BibliographyChecker:
             is_search_link=russian_result.get('is_search_link', False)
         )
 
-    def _enhance_single_entry(self, entry: BibliographyEntry) -> BibliographyEntry:
-        """Улучшает одну библиографическую запись"""
-        search_queries = self._generate_search_queries(entry.text)
-        entry.search_queries = search_queries
-
-        best_overall_result = None
-        best_confidence = 0.0
-
-        for query in search_queries:
-            print(f"      Поиск: '{query}'")
-            try:
-                results = self.online_searcher.search_publication(query)
-
-                if results:
-                    best_result = self._filter_best_result(results, query)
-
-                    if best_result and best_result.confidence > best_confidence:
-                        best_overall_result = best_result
-                        best_confidence = best_result.confidence
-                        print(f"      Найден результат (уверенность: {best_result.confidence:.2f})")
-
-                        if best_result.confidence > 0.8:
-                            break
-                else:
-                    print(f"      Не найдено результатов для: {query}")
-
-            except Exception as e:
-                print(f"      Ошибка при поиске '{query}': {e}")
-                continue
-
-        if best_overall_result and best_confidence > 0.3:
-            entry.online_metadata = self._format_online_metadata(best_overall_result)
-            entry.is_verified = True
-            entry.enhancement_confidence = best_confidence
-            print(f"      Используем результат с уверенностью: {best_confidence:.2f}")
-        else:
-            print(f"      Не найдено достаточно качественных результатов")
-
-        return entry
-
     def _format_online_metadata(self, result: SearchResult) -> Dict[str, Any]:
         """Форматирует результат поиска для хранения"""
         return {
@@ -690,23 +750,45 @@ class BibliographyChecker:
             'retrieved_at': time.time()
         }
 
+    def _get_cached_parse(self, kind: str, clean_text: str):
+        """Возвращает закэшированный результат разбора записи (или None)"""
+        key = (kind, clean_text)
+        with self._entry_parse_cache_lock:
+            cached = self._entry_parse_cache.get(key)
+            if cached is not None:
+                self._entry_parse_cache.move_to_end(key)
+            return cached
+
+    def _store_parse(self, kind: str, clean_text: str, value):
+        """Сохраняет результат разбора записи, вытесняя самые старые записи"""
+        with self._entry_parse_cache_lock:
+            self._entry_parse_cache[(kind, clean_text)] = value
+            while len(self._entry_parse_cache) > ENTRY_PARSE_CACHE_SIZE:
+                self._entry_parse_cache.popitem(last=False)
+
     def _generate_search_queries(self, text: str) -> List[str]:
-        """Улучшенная генерация поисковых запросов"""
+        """Улучшенная генерация поисковых запросов (с кэшем по тексту записи)"""
+        cached = self._get_cached_parse('queries', text)
+        if cached is None:
+            cached = tuple(self._build_search_queries(text))
+            self._store_parse('queries', text, cached)
+        return list(cached)
+
+    def _build_search_queries(self, text: str) -> List[str]:
+        """Строит поисковые запросы по записи"""
         queries = []
 
         # Очищаем текст
-        clean_text = re.sub(r'\[.*?\]', '', text)
-        clean_text = re.sub(r'[^\w\s.,;:()-]', '', clean_text)
+        clean_text = _SQUARE_BRACKETS_RE.sub('', text) if '[' in text else text
+        clean_text = _QUERY_JUNK_RE.sub('', clean_text)
 
         # 1. Основной очищенный запрос
         if clean_text.strip():
             queries.append(clean_text.strip())
 
         # 2. Упрощенный запрос
-        simple_text = re.sub(
-            r'\b(изд-во|издательство|учебник|пособие|монография|статья|под ред|ред\.|с\.|стр\.|т\.|вып\.)\b.*?[.,]', '',
-            clean_text, flags=re.IGNORECASE)
-        simple_text = re.sub(r'\d+\.\d+|\d+-\d+', '', simple_text)  # Убираем номера страниц
+        simple_text = _QUERY_TECH_INFO_RE.sub('', clean_text)
+        simple_text = _PAGE_NUMBERS_RE.sub('', simple_text)  # Убираем номера страниц
         if simple_text.strip() and simple_text != clean_text:
             queries.append(simple_text.strip())
 
@@ -734,22 +816,15 @@ class BibliographyChecker:
     def _extract_improved_title(self, text: str) -> Optional[str]:
         """Улучшенное извлечение названия работы"""
         # Убираем авторов (всё до первой точки или двоеточия)
-        text_without_authors = re.sub(r'^[^.:]*[.:]', '', text).strip()
+        text_without_authors = _strip_author_block(text, any_delimiter='.:')
 
         # Убираем год
-        text_without_year = re.sub(r'\b(19|20)\d{2}\b', '', text_without_authors)
+        text_without_year = _YEAR_RE.sub('', text_without_authors)
 
         # Убираем издательство и прочую техническую информацию
-        patterns_to_remove = [
-            r'\/\/.*$',  # Всё после //
-            r'—.*$',  # Всё после —
-            r'\.—.*$',  # Всё после .—
-            r'\(.*\)',  # Скобки с содержимым
-            r'\b(изд-во|издательство|учебник|пособие|монография|статья)\b.*$',
-        ]
-
-        for pattern in patterns_to_remove:
-            text_without_year = re.sub(pattern, '', text_without_year)
+        for guard, pattern in _TITLE_TAIL_PATTERNS:
+            if guard in text_without_year:
+                text_without_year = pattern.sub('', text_without_year)
 
         # Берем первые 5-8 слов как возможное название
         words = text_without_year.strip().split()
@@ -761,9 +836,18 @@ class BibliographyChecker:
     def _extract_search_params_from_entry(self, entry_text: str) -> Dict[str, Any]:
         """Извлекает параметры поиска из библиографической записи - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
         # Очищаем текст
-        clean_text = re.sub(r'\s+', ' ', entry_text.strip())
+        clean_text = _normalize_citation_text(entry_text)
         print(f"\n        📝 Оригинальный текст: '{clean_text[:100]}...'")
 
+        cached = self._get_cached_parse('params', clean_text)
+        if cached is None:
+            cached = self._parse_search_params(clean_text)
+            self._store_parse('params', clean_text, cached)
+        # Копия, чтобы вызывающий код не испортил закэшированный результат
+        return {**cached, 'authors': list(cached['authors'])}
+
+    def _parse_search_params(self, clean_text: str) -> Dict[str, Any]:
+        """Разбирает нормализованную запись на поля (все регулярные выражения)"""
         # 1. Извлекаем заголовок
         title = self._extract_title(clean_text)
 
@@ -775,54 +859,29 @@ class BibliographyChecker:
 
         # 4. Извлекаем DOI
         doi = None
-        doi_patterns = [
-            r'doi:\s*([^\s,.;]+)',
-            r'DOI:\s*([^\s,.;]+)',
-            r'https?://doi\.org/([^\s]+)',
-            r'\b10\.\d{4,9}/[^\s]+'
-        ]
-        for pattern in doi_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
+        for pattern in _DOI_PATTERNS:
+            match = pattern.search(clean_text)
             if match:
                 doi = match.group(1).strip()
                 break
 
         # 5. Извлекаем ISBN
         isbn = None
-        isbn_patterns = [
-            r'ISBN[\s:-]*([\d\-X]{10,17})',
-            r'ISBN\s+([\d\-X]{10,17})',
-            r'\b[\d\-X]{10,17}\b(?=.*ISBN)',
-        ]
-        for pattern in isbn_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
+        for pattern in _ISBN_PATTERNS:
+            match = pattern.search(clean_text)
             if match:
                 isbn = match.group(1).strip()
                 break
 
         # 6. Извлекаем издательство
-        publisher = None
-        publisher_patterns = [
-            r'—\s*[^:]*:\s*([^.,;]+?)(?=\.|,|;|\s*\d|$)',
-            r':\s*([^.,;]+?)(?=\.|,|;|\s*\d|$)',
-            r'изд-во\s+([^.,;]+)',
-            r'издательство\s+([^.,;]+)',
-        ]
-        for pattern in publisher_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
-            if match:
-                publisher = match.group(1).strip()
-                break
+        publisher = _find_publisher(clean_text)
+        if publisher is not None:
+            publisher = publisher.strip()
 
         # 7. Извлекаем журнал
         journal = None
-        journal_patterns = [
-            r'//\s*([^.,]+?)(?=\.|,|\s*\d|$)',
-            r'журнал\s+([^.,;]+)',
-            r'Журнал\s+([^.,;]+)',
-        ]
-        for pattern in journal_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
+        for pattern in _JOURNAL_PATTERNS:
+            match = pattern.search(clean_text)
             if match:
                 journal = match.group(1).strip()
                 break
@@ -858,12 +917,11 @@ class BibliographyChecker:
         author = author.lower().strip()
 
         # Удаляем инициалы и точки
-        author = re.sub(r'[а-я]\.\s*', '', author)  # русские инициалы
-        author = re.sub(r'[a-z]\.\s*', '', author)  # английские инициалы
-        author = re.sub(r'\.', '', author)  # все оставшиеся точки
+        author = _AUTHOR_INITIALS_RE.sub('', author)  # русские и английские инициалы
+        author = author.replace('.', '')  # все оставшиеся точки
 
         # Удаляем лишние пробелы
-        author = re.sub(r'\s+', ' ', author).strip()
+        author = ' '.join(author.split())
 
         # Берем только фамилию (первое слово)
         parts = author.split()
@@ -883,16 +941,13 @@ class BibliographyChecker:
 
         # 1. Ищем паттерн: Фамилия, И. О. (русские авторы)
         # Пример: "Лопарева, А. М." или "Грачев, С. А., Гундорова, М. А."
-        pattern_russian = r'([А-ЯЁ][а-яё]+),\s*[А-ЯЁ]\.\s*[А-ЯЁ]\.'
-
-        matches = re.findall(pattern_russian, text)
+        matches = _AUTHOR_COMMA_INITIALS_RE.findall(text)
         if matches:
             print(f"        ✅ Найдены авторы (паттерн русский): {matches}")
             return matches  # Возвращаем список фамилий
 
         # 2. Если не нашли, ищем другой паттерн: Фамилия И.О.
-        pattern_russian2 = r'([А-ЯЁ][а-яё]+)\s+[А-ЯЁ]\.[А-ЯЁ]\.'
-        matches = re.findall(pattern_russian2, text)
+        matches = _AUTHOR_INITIALS_AFTER_RE.findall(text)
         if matches:
             print(f"        ✅ Найдены авторы (паттерн русский2): {matches}")
             return matches
@@ -904,7 +959,7 @@ class BibliographyChecker:
 
         for i, word in enumerate(words[:7]):
             # Проверяем, похоже ли слово на фамилию
-            if (re.match(r'^[А-ЯЁ][а-яё]+$', word) and
+            if (_SURNAME_RE.match(word) and
                     len(word) > 2 and
                     word.lower() not in ['изд', 'под', 'ред', 'авт', 'сост']):
                 potential_authors.append(word)
@@ -919,26 +974,14 @@ class BibliographyChecker:
     def _extract_authors(self, text: str) -> Optional[str]:
         """Извлекает авторов из библиографической записи"""
         # Паттерны для русских авторов: "Иванов И.И.", "Петров А.В."
-        patterns = [
-            r'^([А-Я][а-я]+ [А-Я]\.[А-Я]\.)',  # Иванов И.И.
-            r'^([А-Я][а-я]+ [А-Я][а-я]+ [А-Я]\.[А-Я]\.)',  # Иванов Иван И.И.
-            r'^([А-Я][а-я]+,\s*[А-Я]\.[А-Я]\.)',  # Иванов, И.И.
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in _AUTHOR_PATTERNS_RU:
+            match = pattern.search(text)
             if match:
                 return match.group(1)
 
         # Паттерны для английских авторов
-        patterns_en = [
-            r'^([A-Z][a-z]+ [A-Z]\.)',  # Smith J.
-            r'^([A-Z][a-z]+ [A-Z]\. [A-Z]\.)',  # Smith J. K.
-            r'^([A-Z][a-z]+,\s*[A-Z]\.)',  # Smith, J.
-        ]
-
-        for pattern in patterns_en:
-            match = re.search(pattern, text)
+        for pattern in _AUTHOR_PATTERNS_EN:
+            match = pattern.search(text)
             if match:
                 return match.group(1)
 
@@ -946,8 +989,7 @@ class BibliographyChecker:
 
     def _extract_year(self, text: str) -> Optional[str]:
         """Извлекает год публикации"""
-        match = re.search(r'\b(19|20)\d{2}\b', text)
-        return match.group(0) if match else None
+        return _find_year(text)
 
     def _extract_title(self, text: str) -> Optional[str]:
         """Извлекает название работы - ИСПРАВЛЕННАЯ"""
@@ -956,59 +998,45 @@ class BibliographyChecker:
 
         # 1. Удаляем авторов в начале (всё до первого двоеточия или точки после авторов)
         # Простой паттерн: фамилия, инициалы
-        text_without_authors = re.sub(
-            r'^[А-ЯЁ][а-яё]+(?:,\s*[А-ЯЁ]\.[А-ЯЁ]\.)?(?:\s+и\s+[А-ЯЁ][а-яё]+(?:,\s*[А-ЯЁ]\.[А-ЯЁ]\.)?)*', '', text)
+        text_without_authors = _TITLE_AUTHORS_PREFIX_RE.sub('', text)
 
         # 2. Удаляем начальные знаки препинания
         text_without_authors = text_without_authors.lstrip('.,: ')
 
         # 3. Удаляем квадратные скобки
-        text_without_authors = re.sub(r'\[.*?\]', '', text_without_authors)
+        text_without_authors = _SQUARE_BRACKETS_RE.sub('', text_without_authors)
 
         # 4. Ищем настоящий заголовок
         # Заголовок обычно до: ":", "/", " — ", "("
-        patterns = [
-            r'^([^:/—(]+?)(?=:\s*(?:учебник|пособие|учебное|практикум))',
-            r'^([^:/—(]+?)(?=/\s*[А-ЯЁA-Z])',
-            r'^([^:/—(]+?)(?=—)',
-            r'^([^:/—(]+?)(?=\()',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text_without_authors)
+        for pattern in _TITLE_PATTERNS:
+            match = pattern.search(text_without_authors)
             if match:
                 title = match.group(1).strip()
                 # Очищаем от лишнего
-                title = re.sub(r'[.,:;—/]$', '', title).strip()
+                title = _TRAILING_PUNCT_RE.sub('', title).strip()
 
                 if title and len(title) > 3:
                     # Удаляем инициалы в начале заголовка
-                    title = re.sub(r'^[А-ЯЁ]\.\s*[А-ЯЁ]\.\s*', '', title)
+                    title = _LEADING_INITIALS_RE.sub('', title)
                     return title
 
         return None
 
     def _is_definitely_not_bibliography(self, text: str) -> bool:
-        text_lower = text.lower()
-        not_biblio_indicators = [
-            any(word in text_lower for word in ['т.р.', 'тыс. руб.', 'руб.', 'стоимость', 'цена', 'закупка']),
-            re.search(r'\d+\s*т\.р\.', text),
-            re.search(r'\d+\s*руб', text),
-            any(term in text_lower for term in ['ндс', 'оборудован', 'персонал', 'производств']),
-            len(text) < 30 and any(char.isdigit() for char in text),
-            any(char in text for char in ['+', '-', '*', '/', '=']),
-        ]
-        return any(not_biblio_indicators)
+        # Признаки проверяются по порядку и прерываются на первом совпадении
+        return bool(
+            _OPERATOR_CHARS_RE.search(text) or
+            (len(text) < 30 and _DIGIT_RE.search(text)) or
+            _NOT_BIBLIO_WORDS_RE.search(text) or
+            _MONEY_RE.search(text)
+        )
 
     def _looks_like_table_data(self, text: str) -> bool:
-        table_indicators = [
-            bool(re.search(r'\d+[\s,]*т\.р\.', text)),
-            bool(re.search(r'\d+[\s,]*руб', text)),
-            bool(re.search(r'\d+[\s,]*%', text)),
-            len(text) < 50 and any(char.isdigit() for char in text),
-            any(word in text.lower() for word in ['цена', 'стоимость', 'закупка', 'расход', 'доход']),
-        ]
-        return any(table_indicators)
+        return bool(
+            (len(text) < 50 and _DIGIT_RE.search(text)) or
+            _TABLE_WORDS_RE.search(text) or
+            _TABLE_NUMBERS_RE.search(text)
+        )
 
     def _is_bibliography_entry(self, text: str) -> bool:
         if not text or not text.strip():
@@ -1023,22 +1051,17 @@ class BibliographyChecker:
         if len(text) < 20:
             return False
 
-        starts_with_number = any(text.strip().startswith(f"{i}.") for i in range(1, 100))
-        starts_with_bracket = re.match(r'^\[\d+\]', text.strip())
-        has_year = bool(re.search(r'\b(19|20)\d{2}\b', text))
+        stripped = text.strip()
+        starts_with_number = _starts_with_item_number(stripped)
+        starts_with_bracket = _NUMBERED_REF_RE.match(stripped)
+        has_year = _find_year(text) is not None
 
-        has_biblio_keywords = any(keyword in text_lower for keyword in [
-            'изд-во', 'издательство', 'журнал', 'т.', 'вып.', 'с.', 'стр.', 'сс.',
-            'университет', 'университета', 'институт', 'академия', 'наук',
-            'издание', 'монография', 'учебник', 'пособие', 'статья',
-            'м.:', 'спб.:', 'киев:', 'минск:',
-            'экономика', 'финансы', 'статистика', 'менеджмент', 'маркетинг'
-        ])
+        has_biblio_keywords = any(keyword in text_lower for keyword in _BIBLIO_ENTRY_KEYWORDS)
 
-        has_comma_and_year = (',' in text and bool(re.search(r'\b(19|20)\d{2}\b', text)))
+        has_comma_and_year = (',' in text and has_year)
         punctuation_count = text.count('.') + text.count(',')
         has_punctuation = punctuation_count >= 3
-        has_abbreviations = any(abbr in text for abbr in ['т.', 'вып.', 'с.', 'сс.', 'г.'])
+        has_abbreviations = any(abbr in text for abbr in _BIBLIO_ABBREVIATIONS)
         reasonable_length = 30 < len(text) < 800
 
         strong_indicators = [
@@ -1137,48 +1160,51 @@ class BibliographyChecker:
         if not results:
             return None
 
-        # Сначала сортируем по уверенности
-        sorted_results = sorted(results, key=lambda x: x.confidence, reverse=True)
-
         # Простая проверка релевантности по заголовку
         query_words = set(original_query.lower().split())
 
-        for result in sorted_results:
-            if result.title:
-                title_words = set(result.title.lower().split())
+        # Один проход без сортировки: самый уверенный релевантный и самый уверенный вообще
+        # (при равной уверенности побеждает более ранний, как при устойчивой сортировке)
+        best_relevant = None
+        best_any = None
+        for result in results:
+            if best_any is None or result.confidence > best_any.confidence:
+                best_any = result
+            if result.title and (best_relevant is None or result.confidence > best_relevant.confidence):
                 # Если есть пересечение ключевых слов, считаем релевантным
-                common_words = query_words.intersection(title_words)
+                common_words = query_words.intersection(result.title.lower().split())
                 if len(common_words) >= 2:  # Минимум 2 общих слова
-                    return result
+                    best_relevant = result
 
         # Если нет явно релевантных, возвращаем самый уверенный
-        return sorted_results[0] if sorted_results else None
+        return best_relevant or best_any
 
     def _is_relevant_result(self, result: SearchResult, original_text: str) -> bool:
         """Проверяет релевантность результата оригинальной библиографической записи"""
         original_lower = original_text.lower()
-        result_title = result.title.lower() if result.title else ""
-
-        # Ключевые слова из оригинальной записи тест
-        key_phrases = [
-            'толстой', 'война и мир',  # Для Толстого
-            'экономик', 'анализ данных',  # Для экономики
-            'машинное обучение', 'кнутсен',  # Для ML
-            'бизнес-план', 'предпринимательство'  # Для бизнеса
-        ]
+        return self._is_relevant_result_with_state(
+            result, original_lower, frozenset(_KNOWN_WORK_RE.findall(original_lower))
+        )
 
-        # Проверяем совпадение ключевых фраз
-        for phrase in key_phrases:
-            if phrase in original_lower and phrase in result_title:
-                return True
+    def _is_relevant_result_with_state(self, result: SearchResult, original_lower: str,
+                                       original_phrases: frozenset) -> bool:
+        """Проверка релевантности с заранее подготовленными данными оригинальной записи"""
+        # Без заголовка и авторов сравнивать нечего
+        if not result.title and not result.authors:
+            return False
 
-        # Проверяем авторов
+        # Сначала дешевая проверка авторов (поиск подстрок)
         if result.authors:
             for author in result.authors:
                 author_lower = author.lower()
                 if any(author_word in original_lower for author_word in author_lower.split()):
                     return True
 
+        # Затем ключевые фразы заголовка против фраз оригинальной записи
+        if result.title and original_phrases:
+            if not original_phrases.isdisjoint(_KNOWN_WORK_RE.findall(result.title.lower())):
+                return True
+
         return False
 
     def _enhance_single_entry(self, entry: BibliographyEntry) -> BibliographyEntry:
@@ -1192,6 +1218,10 @@ class BibliographyChecker:
         best_relevant_result = None
         best_confidence = 0.0
 
+        # Данные оригинальной записи одинаковы для всех результатов - считаем один раз
+        original_lower = entry.text.lower()
+        original_phrases = frozenset(_KNOWN_WORK_RE.findall(original_lower))
+
         for query in search_queries:
             print(f"      🔎 Поиск: '{query}'")
             try:
@@ -1200,11 +1230,11 @@ class BibliographyChecker:
                 if results:
                     for result in results:
                         # Проверяем релевантность
-                        if self._is_relevant_result(result, entry.text):
+                        if self._is_relevant_result_with_state(result, original_lower, original_phrases):
                             if result.confidence > best_confidence:
                                 best_relevant_result = result
                                 best_confidence = result.confidence
-                                print(f"      Релевантный результат (уверенность: {result.confidence:.2f})")
+                                self.logger.debug("Релевантный результат (уверенность: %.2f)", result.confidence)
 
                                 if result.confidence > 0.8:
                                     break
@@ -1267,29 +1297,25 @@ class BibliographyChecker:
                         source_content) > 500 else source_content
                 })
 
-        # Сортируем по количеству совпадений
-        results.sort(key=lambda x: x['match_score'], reverse=True)
-
         return {
             'citation_text': citation_text,
             'context': context,
-            'found_in_sources': results[:3] if results else [],  # Топ-3 результатов
+            # Топ-3 результатов по количеству совпадений
+            'found_in_sources': heapq.nlargest(3, results, key=lambda x: x['match_score']),
             'total_matches': len(results)
         }
 
     def _extract_keywords_from_context(self, context: str) -> List[str]:
         """Извлекает ключевые слова из контекста цитаты"""
         # Убираем стоп-слова и короткие слова
-        stop_words = {'и', 'в', 'на', 'по', 'с', 'из', 'для', 'что', 'как', 'это', 'то', 'же', 'все', 'его', 'их'}
-
-        words = re.findall(r'\b[а-яА-ЯёЁ]{4,}\b', context.lower())
-        keywords = [word for word in words if word not in stop_words]
+        words = _CYRILLIC_WORD_RE.findall(context.lower())
+        keywords = [word for word in words if word not in _CONTEXT_STOP_WORDS]
 
         return list(set(keywords))  # Убираем дубликаты
 
     def _find_best_snippet(self, text: str, keywords: List[str]) -> str:
         """Находит лучший фрагмент текста с ключевыми словами"""
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = _SENTENCE_SPLIT_RE.split(text)
 
         if not sentences:
             return text[:300] + "..." if len(text) > 300 else text
@@ -1306,11 +1332,8 @@ class BibliographyChecker:
                 scored_sentences.append((score, sentence))
 
         if scored_sentences:
-            # Сортируем по количеству совпадений
-            scored_sentences.sort(key=lambda x: x[0], reverse=True)
-
-            # Берем лучшее предложение и контекст вокруг него
-            best_sentence = scored_sentences[0][1]
+            # Берем лучшее предложение по количеству совпадений и контекст вокруг него
+            best_sentence = max(scored_sentences, key=lambda x: x[0])[1]
 
             # Находим индекс этого предложения
             for i, sent in enumerate(sentences):
@@ -1353,7 +1376,7 @@ class BibliographyChecker:
                 'found': True,
                 'confidence': min(best_match['similarity'] * 100, 95),
                 'match_type': 'similar',
-                'similar_matches': similar_matches[:3],
+                'similar_matches': similar_matches,
                 'best_match': best_match['text'][:200] + "..." if len(best_match['text']) > 200 else best_match['text']
             }
 
@@ -1382,20 +1405,24 @@ class BibliographyChecker:
         full_text = f"{text or ''} {context or ''}".strip()
 
         # Убираем номера цитат
-        full_text = re.sub(r'\[\d+\]', '', full_text)
+        full_text = _CITATION_NUMBER_RE.sub('', full_text)
 
         # Убираем лишние пробелы
-        full_text = re.sub(r'\s+', ' ', full_text)
+        full_text = _WHITESPACE_RE.sub(' ', full_text)
 
         # Оставляем разумную длину
         return full_text[:500]
 
-    def _find_similar_phrases(self, citation: str, source: str, min_length: int = 20) -> List[Dict]:
-        """Находит семантически похожие фразы в источнике"""
+    def _find_similar_phrases(self, citation: str, source: str, min_length: int = 20,
+                              limit: int = 3) -> List[Dict]:
+        """Находит семантически похожие фразы в источнике (не больше limit лучших)"""
         # Разбиваем на предложения
-        sentences = re.split(r'(?<=[.!?])\s+', citation)
+        sentences = _SENTENCE_SPLIT_RE.split(citation)
         matches = []
 
+        # Предложения источника (и их множества слов) одинаковы для всех предложений цитаты - строим один раз
+        source_sentences = [(s, set(s.lower().split())) for s in _SENTENCE_SPLIT_RE.split(source)]
+
         for sentence in sentences:
             if len(sentence) < min_length:
                 continue
@@ -1405,10 +1432,11 @@ class BibliographyChecker:
             words = set(sentence.lower().split())
 
             # Ищем в источнике предложения с общими словами
-            source_sentences = re.split(r'(?<=[.!?])\s+', source)
-
-            for source_sentence in source_sentences:
-                source_words = set(source_sentence.lower().split())
+            for source_sentence, source_words in source_sentences:
+                # Схожесть не больше len(words) / len(source_words): если это не выше порога 0.3,
+                # предложение пропускаем без пересечения множеств (сравнение в целых числах)
+                if 10 * len(words) <= 3 * len(source_words):
+                    continue
                 common_words = words.intersection(source_words)
 
                 if len(common_words) >= max(2, len(words) * 0.3):  # Хотя бы 30% общих слов
@@ -1421,9 +1449,8 @@ class BibliographyChecker:
                             'common_words': list(common_words)
                         })
 
-        # Сортируем по схожести
-        matches.sort(key=lambda x: x['similarity'], reverse=True)
-        return matches
+        # Лучшие по схожести: частичная выборка вместо полной сортировки (порядок тот же, что у sorted)
+        return heapq.nlargest(limit, matches, key=lambda x: x['similarity'])
 
     def verify_citation_semantically(self, citation_data: Dict[str, Any],
                                      source_data: Dict[str, Any]) -> Dict[str, Any]:
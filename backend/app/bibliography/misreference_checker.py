@@ -6,6 +6,9 @@ from sklearn.metrics.pairwise import cosine_similarity
 
 logger = logging.getLogger(__name__)
 
+_CITATION_NUMBER_RE = re.compile(r'\[\d+\]')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
 
 class MisreferenceChecker:
     """
@@ -236,7 +239,7 @@ class MisreferenceChecker:
 
     def _split_into_sentences(self, text: str) -> List[str]:
         """Разбивает текст на предложения"""
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = _SENTENCE_SPLIT_RE.split(text)
         return [s.strip() for s in sentences if s.strip()]
 
     def _split_into_chunks(self, text: str, chunk_size: int = 300) -> List[str]:
@@ -254,9 +257,9 @@ class MisreferenceChecker:
     def _clean_text(self, text: str) -> str:
         """Очищает текст для сравнения"""
         # Убираем номера цитат
-        text = re.sub(r'\[\d+\]', '', text)
+        text = _CITATION_NUMBER_RE.sub('', text)
         # Приводим к нижнему регистру
         text = text.lower()
         # Убираем лишние пробелы
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = ' '.join(text.split())
         return text
\ No newline at end of file
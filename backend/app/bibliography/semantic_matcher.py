@@ -1,15 +1,44 @@
 import re
 import string
 from typing import Dict, List, Tuple, Optional, Any, Set
-from collections import Counter
+from collections import Counter, OrderedDict
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import vstack
 import logging
+import threading
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Сколько TF-IDF векторов (цитат и абзацев источников) держать в кэше
+TFIDF_VECTOR_CACHE_SIZE = 4096
+
+# Русские стоп-слова: собираются один раз при импорте, а не при каждом вызове
+_RUSSIAN_STOP_WORDS = frozenset({
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то',
+    'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за',
+    'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет',
+    'о', 'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг', 'ли', 'если',
+    'уже', 'или', 'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять',
+    'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они',
+    'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем', 'была',
+    'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет',
+    'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем',
+    'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас',
+    'были', 'куда', 'зачем', 'всех', 'никогда', 'можно', 'при', 'наконец', 'два',
+    'об', 'другой', 'хоть', 'после', 'над', 'больше', 'тот', 'через', 'эти', 'нас',
+    'про', 'всего', 'них', 'какая', 'много', 'разве', 'три', 'эту', 'моя', 'впрочем',
+    'хорошо', 'свою', 'этой', 'перед', 'иногда', 'лучше', 'чуть', 'том', 'нельзя',
+    'такой', 'им', 'более', 'всегда', 'конечно', 'всю', 'между'
+})
+
+# Расширенный список стоп-слов для извлечения ключевых слов (добавлены служебные слова)
+_KEYWORD_STOP_WORDS = _RUSSIAN_STOP_WORDS | {
+    'данные', 'этого', 'раздела', 'получены', 'это', 'что', 'как', 'так', 'также'
+}
+
 
 class FixedSemanticCitationMatcher:
     """
@@ -23,32 +52,35 @@ class FixedSemanticCitationMatcher:
         self.language = language
 
         # Инициализация TF-IDF с русскими стоп-словами
-        russian_stop_words = {
-            'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то',
-            'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за',
-            'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет',
-            'о', 'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг', 'ли', 'если',
-            'уже', 'или', 'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять',
-            'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они',
-            'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем', 'была',
-            'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет',
-            'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем',
-            'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас',
-            'были', 'куда', 'зачем', 'всех', 'никогда', 'можно', 'при', 'наконец', 'два',
-            'об', 'другой', 'хоть', 'после', 'над', 'больше', 'тот', 'через', 'эти', 'нас',
-            'про', 'всего', 'них', 'какая', 'много', 'разве', 'три', 'эту', 'моя', 'впрочем',
-            'хорошо', 'свою', 'этой', 'перед', 'иногда', 'лучше', 'чуть', 'том', 'нельзя',
-            'такой', 'им', 'более', 'всегда', 'конечно', 'всю', 'между'
-        }
-
         self.vectorizer = TfidfVectorizer(
             max_features=7000,
-            stop_words=list(russian_stop_words),
+            stop_words=list(_RUSSIAN_STOP_WORDS),
             ngram_range=(1, 3),
             min_df=1,
             max_df=0.9,
             sublinear_tf=True
         )
+        # Векторы уже обученного векторизатора: очищенный текст -> разреженный вектор.
+        # Одна цитата сравнивается со всеми абзацами всех источников - векторизуется один раз
+        self._vector_cache = OrderedDict()
+        # Проверки источников идут в потоках: обучение векторизатора и кэш векторов - под блокировкой
+        self._vectorizer_lock = threading.Lock()
+
+    def is_vectorizer_fitted(self) -> bool:
+        """Обучен ли векторизатор (словарь TF-IDF фиксируется один раз - по первой паре текстов)"""
+        return hasattr(self.vectorizer, 'vocabulary_')
+
+    def _transform_cached(self, text_clean: str):
+        """TF-IDF вектор текста (с кэшем; словарь векторизатора после обучения не меняется)"""
+        vec = self._vector_cache.get(text_clean)
+        if vec is not None:
+            self._vector_cache.move_to_end(text_clean)
+            return vec
+        vec = self.vectorizer.transform([text_clean])
+        self._vector_cache[text_clean] = vec
+        while len(self._vector_cache) > TFIDF_VECTOR_CACHE_SIZE:
+            self._vector_cache.popitem(last=False)
+        return vec
 
     def preprocess_text(self, text: str, preserve_keywords: bool = True) -> str:
         """Предобработка текста (к нижнему регистру, удаление спец символов и тд)"""
@@ -64,7 +96,7 @@ class FixedSemanticCitationMatcher:
         else:
             text = re.sub(r'[^\w\s]', ' ', text)
 
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = ' '.join(text.split())
         return text
 
     def extract_key_phrases(self, text: str, max_phrases: int = 15) -> List[str]:
@@ -75,30 +107,12 @@ class FixedSemanticCitationMatcher:
         text_clean = self.preprocess_text(text, preserve_keywords=True)
         words = text_clean.split()
 
-        russian_stop_words = {
-            'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то',
-            'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за',
-            'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет',
-            'о', 'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг', 'ли', 'если',
-            'уже', 'или', 'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять',
-            'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они',
-            'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем', 'была',
-            'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет',
-            'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем',
-            'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас',
-            'были', 'куда', 'зачем', 'всех', 'никогда', 'можно', 'при', 'наконец', 'два',
-            'об', 'другой', 'хоть', 'после', 'над', 'больше', 'тот', 'через', 'эти', 'нас',
-            'про', 'всего', 'них', 'какая', 'много', 'разве', 'три', 'эту', 'моя', 'впрочем',
-            'хорошо', 'свою', 'этой', 'перед', 'иногда', 'лучше', 'чуть', 'том', 'нельзя',
-            'такой', 'им', 'более', 'всегда', 'конечно', 'всю', 'между'
-        }
-
         # ✅ ИЗВЛЕКАЕМ ТОЛЬКО СЛОВА ДЛИННЕЕ 3 СИМВОЛОВ
         important_words = []
         for w in words:
             w_clean = w.strip('.,!?;:()"\'')
             if (w_clean and
-                    w_clean not in russian_stop_words and
+                    w_clean not in _RUSSIAN_STOP_WORDS and
                     len(w_clean) > 3 and
                     not w_clean.isdigit()):
                 important_words.append(w_clean)
@@ -142,15 +156,16 @@ class FixedSemanticCitationMatcher:
             return jaccard
 
         try:
-            if hasattr(self.vectorizer, 'vocabulary_'):
-                print("   🔄 Using existing vectorizer")
-                vec1 = self.vectorizer.transform([text1_clean])
-                vec2 = self.vectorizer.transform([text2_clean])
-            else:
-                print("   🔄 Fitting new vectorizer")
-                tfidf_matrix = self.vectorizer.fit_transform([text1_clean, text2_clean])
-                vec1 = tfidf_matrix[0:1]
-                vec2 = tfidf_matrix[1:2]
+            with self._vectorizer_lock:
+                if hasattr(self.vectorizer, 'vocabulary_'):
+                    print("   🔄 Using existing vectorizer")
+                    vec1 = self._transform_cached(text1_clean)
+                    vec2 = self._transform_cached(text2_clean)
+                else:
+                    print("   🔄 Fitting new vectorizer")
+                    tfidf_matrix = self.vectorizer.fit_transform([text1_clean, text2_clean])
+                    vec1 = tfidf_matrix[0:1]
+                    vec2 = tfidf_matrix[1:2]
 
             similarity = cosine_similarity(vec1, vec2)[0][0]
             print(f"   📊 Cosine similarity: {similarity:.3f}")
@@ -170,6 +185,68 @@ class FixedSemanticCitationMatcher:
             print(f"   📊 Fallback Jaccard: {jaccard:.3f}")
             return jaccard
 
+    def calculate_semantic_similarities(self, text1: str, texts: List[str]) -> List[float]:
+        """
+        Схожесть текста с каждым из texts - то же, что calculate_semantic_similarity для каждой пары,
+        но косинусы TF-IDF считаются одной матричной операцией
+        """
+        similarities = [0.0] * len(texts)
+        if not text1:
+            return similarities
+
+        text1_clean = self.preprocess_text(text1)
+        text1_words = len(text1_clean.split())
+
+        # Короткие тексты сравниваются по Jaccard, остальные - через TF-IDF
+        cleaned = {}
+        pending = []
+        for j, text in enumerate(texts):
+            if not text:
+                continue
+            text_clean = self.preprocess_text(text)
+            cleaned[j] = text_clean
+            if text1_words < 5 or len(text_clean.split()) < 5:
+                similarities[j] = self._calculate_jaccard_similarity(text1_clean, text_clean)
+            else:
+                pending.append(j)
+
+        if not pending:
+            return similarities
+
+        try:
+            with self._vectorizer_lock:
+                # Векторизатор обучается на первой паре, как в calculate_semantic_similarity;
+                # если на паре обучить не удалось - она сравнивается по Jaccard, обучаемся на следующей
+                while pending and not hasattr(self.vectorizer, 'vocabulary_'):
+                    j = pending[0]
+                    try:
+                        print("   🔄 Fitting new vectorizer")
+                        self.vectorizer.fit_transform([text1_clean, cleaned[j]])
+                    except Exception as e:
+                        print(f"   ❌ Error calculating similarity: {e}")
+                        similarities[j] = self._calculate_jaccard_similarity(text1_clean, cleaned[j])
+                        del pending[0]
+                if not pending:
+                    return similarities
+                vec1 = self._transform_cached(text1_clean)
+                matrix = vstack([self._transform_cached(cleaned[j]) for j in pending])
+            cosines = cosine_similarity(vec1, matrix)[0]
+        except Exception as e:
+            print(f"   ❌ Error calculating similarity: {e}")
+            for j in pending:
+                similarities[j] = self._calculate_jaccard_similarity(text1_clean, cleaned[j])
+            return similarities
+
+        for j, similarity in zip(pending, cosines):
+            similarity = float(similarity)
+            if text1_words < 10 or len(cleaned[j].split()) < 10:
+                jaccard = self._calculate_jaccard_similarity(text1_clean, cleaned[j])
+                similarity = 0.6 * similarity + 0.4 * jaccard
+            similarities[j] = similarity
+
+        print(f"📏 SEMANTIC SIMILARITY: {len(texts)} текстов, TF-IDF для {len(pending)}")
+        return similarities
+
     def _calculate_jaccard_similarity(self, text1: str, text2: str) -> float:
         """Jaccard similarity = (пересечение множеств) / (объединение множеств)"""
         words1 = {w for w in text1.split() if len(w) > 2}
@@ -471,6 +548,8 @@ class FixedSemanticCitationMatcher:
             paragraphs = [clean_content]
             print(f"\n⚠️ Нет абзацев, используем весь текст как один абзац")
 
+        # Абзацы, прошедшие фильтры: (текст, число слов)
+        candidates = []
         for i, paragraph in enumerate(paragraphs):
             print(f"\n--- АБЗАЦ {i + 1}/{len(paragraphs)} ---")
             print(f"   Длина: {len(paragraph.split())} слов, {len(paragraph)} символов")
@@ -493,9 +572,12 @@ class FixedSemanticCitationMatcher:
                 continue
 
             print(f"   ✅ ПРОШЕЛ фильтры")
+            candidates.append((paragraph, word_count))
 
-            # Вычисляем семантическую схожесть
-            similarity = self.calculate_semantic_similarity(full_citation_text, paragraph)
+        # Семантическая схожесть цитаты со всеми абзацами - одним пакетом
+        similarities = self.calculate_semantic_similarities(full_citation_text, [p for p, _ in candidates])
+
+        for (paragraph, word_count), similarity in zip(candidates, similarities):
             print(f"   📊 СЕМАНТИЧЕСКАЯ СХОЖЕСТЬ: {similarity:.3f}")
 
             # Проверяем наличие ключевых слов (исключая стоп-слова)
@@ -640,33 +722,12 @@ class FixedSemanticCitationMatcher:
         text_clean = self.preprocess_text(text, preserve_keywords=True)
         words = text_clean.split()
 
-        # Расширенный список стоп-слов
-        russian_stop_words = {
-            'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то',
-            'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за',
-            'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет',
-            'о', 'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг', 'ли', 'если',
-            'уже', 'или', 'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять',
-            'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они',
-            'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем', 'была',
-            'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет',
-            'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем',
-            'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас',
-            'были', 'куда', 'зачем', 'всех', 'никогда', 'можно', 'при', 'наконец', 'два',
-            'об', 'другой', 'хоть', 'после', 'над', 'больше', 'тот', 'через', 'эти', 'нас',
-            'про', 'всего', 'них', 'какая', 'много', 'разве', 'три', 'эту', 'моя', 'впрочем',
-            'хорошо', 'свою', 'этой', 'перед', 'иногда', 'лучше', 'чуть', 'том', 'нельзя',
-            'такой', 'им', 'более', 'всегда', 'конечно', 'всю', 'между',
-            # Добавляем служебные слова
-            'данные', 'этого', 'раздела', 'получены', 'это', 'что', 'как', 'так', 'также'
-        }
-
         # Извлекаем ВСЕ слова длиннее 2 символов
         important_words = []
         for w in words:
             w_clean = w.strip('.,!?;:()"\'')
             if (w_clean and
-                    w_clean not in russian_stop_words and
+                    w_clean not in _KEYWORD_STOP_WORDS and
                     len(w_clean) > 2 and  # ← уменьшили с 3 до 2
                     not w_clean.isdigit()):
                 important_words.append(w_clean)
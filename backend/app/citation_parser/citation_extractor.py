@@ -2,6 +2,25 @@ import re
 from typing import List, Dict, Any, Tuple
 from app.models.data_models import TextBlock
 
+# Символы конца предложения и пропускаемые после него символы
+_SENTENCE_END_CHARS = '.!?'
+_SENTENCE_LEAD_RE = re.compile(r'[ \t\n"\'«»]*')
+_SENTENCE_TAIL_RE = re.compile(r'["\'\u201d»]*')
+_WHITESPACE_RUN_RE = re.compile(r'[ \t\n]*')
+# Числовая цитата: 1 | 1-3 | 1,2,3 (одним проходом вместо трех re.match)
+_NUMERIC_CITATION_RE = re.compile(r'\d+(?:-\d+|(?:,\s*\d+)+)?$')
+
+
+def _rfind_sentence_end(text: str, start: int, end: int) -> int:
+    """Позиция последнего знака конца предложения в text[start:end] или -1"""
+    return max(text.rfind(char, start, end) for char in _SENTENCE_END_CHARS)
+
+
+def _find_sentence_end_char(text: str, start: int, end: int) -> int:
+    """Позиция первого знака конца предложения в text[start:end] или -1"""
+    found = [pos for pos in (text.find(char, start, end) for char in _SENTENCE_END_CHARS) if pos != -1]
+    return min(found) if found else -1
+
 
 class CitationExtractor:
     def __init__(self):
@@ -17,23 +36,20 @@ class CitationExtractor:
             r'\[Рис\. \d+\]',
             r'\[Табл\. \d+\]',
         ]
+        # Компилируем один раз: не-цитаты - одной альтернацией, а не циклом по паттернам
+        self._citation_regexes = [(pattern, re.compile(pattern)) for pattern in self.citation_patterns]
+        self._non_citation_re = re.compile(
+            '|'.join(f'(?:{pattern})' for pattern in self.non_citation_patterns), re.IGNORECASE
+        )
 
     def _is_valid_citation(self, citation: str) -> bool:
         """Проверяет, является ли текст валидной цитатой"""
         # Игнорируем известные не-цитаты
-        for pattern in self.non_citation_patterns:
-            if re.fullmatch(pattern, f"[{citation}]", re.IGNORECASE):
-                return False
-
-        # Цитата должна быть числовой или числовым диапазоном
-        if re.match(r'^\d+$', citation):  # 1, 2, 3
-            return True
-        if re.match(r'^\d+-\d+$', citation):  # 1-3, 10-15
-            return True
-        if re.match(r'^\d+(,\s*\d+)+$', citation):  # 1,2,3 или 1, 2, 3
-            return True
+        if self._non_citation_re.fullmatch(f"[{citation}]"):
+            return False
 
-        return False
+        # Цитата должна быть числовой (1), диапазоном (1-3) или списком (1,2,3 или 1, 2, 3)
+        return _NUMERIC_CITATION_RE.match(citation) is not None
 
     def extract_citations_with_full_context(self, text_blocks: List[TextBlock]) -> Dict[str, Any]:
         """Извлекает цитаты с полными абзацами контекста"""
@@ -175,34 +191,26 @@ class CitationExtractor:
 
     def _find_sentence_start(self, text: str, position: int) -> int:
         """Находит начало предложения перед указанной позицией"""
-        # Ищем конец предыдущего предложения
-        for i in range(position - 1, max(-1, position - 300), -1):
-            if i < 0:
-                return 0
-            if text[i] in '.!?':
-                # Пропускаем возможные кавычки или пробелы
-                j = i + 1
-                while j < len(text) and text[j] in ' \t\n"\'«»':
-                    j += 1
-                return j
+        # Ищем конец предыдущего предложения (str.rfind - цикл на C вместо посимвольного)
+        i = _rfind_sentence_end(text, max(0, position - 299), position)
+        if i != -1:
+            # Пропускаем возможные кавычки или пробелы
+            return _SENTENCE_LEAD_RE.match(text, i + 1).end()
         return max(0, position - 300)
 
     def _find_sentence_end(self, text: str, position: int) -> int:
         """Находит конец предложения после указанной позиции"""
         # Ищем конец текущего предложения
-        for i in range(position, min(len(text), position + 300)):
-            if text[i] in '.!?':
-                # Включаем возможные закрывающие кавычки
-                j = i + 1
-                while j < len(text) and text[j] in '"\'\u201d»':
-                    j += 1
-                return j
+        i = _find_sentence_end_char(text, position, min(len(text), position + 300))
+        if i != -1:
+            # Включаем возможные закрывающие кавычки
+            return _SENTENCE_TAIL_RE.match(text, i + 1).end()
         return min(len(text), position + 300)
 
     def _clean_paragraph_for_display(self, paragraph: str) -> str:
         """Очищает абзац для отображения"""
         # Убираем лишние пробелы
-        paragraph = re.sub(r'\s+', ' ', paragraph.strip())
+        paragraph = ' '.join(paragraph.split())
 
         # Убираем разрывы строк внутри абзаца
         paragraph = paragraph.replace('\n', ' ')
@@ -291,8 +299,8 @@ class CitationExtractor:
         """Находит все цитаты в тексте"""
         citations = []
 
-        for pattern in self.citation_patterns:
-            matches = re.findall(pattern, text)
+        for pattern, regex in self._citation_regexes:
+            matches = regex.findall(text)
             for match in matches:
                 if pattern == r'\[[^\]]+\]':
                     # Проверяем, является ли это валидной цитатой
@@ -340,16 +348,10 @@ class CitationExtractor:
 
         # Ищем начало предложения (первый символ после точки, восклицательного или вопросительного знака)
         sentence_start = start_pos
-        for i in range(start_pos - 1, max(-1, start_pos - 200), -1):
-            if i < 0:
-                sentence_start = 0
-                break
-            if text[i] in '.!?':
-                sentence_start = i + 1
-                # Пропускаем пробелы
-                while sentence_start < len(text) and text[sentence_start] in ' \t\n':
-                    sentence_start += 1
-                break
+        i = _rfind_sentence_end(text, max(0, start_pos - 199), start_pos)
+        if i != -1:
+            # Пропускаем пробелы
+            sentence_start = _WHITESPACE_RUN_RE.match(text, i + 1).end()
 
         # Берем текст от начала предложения до цитаты
         context = text[sentence_start:start_pos].strip()
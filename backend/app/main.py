@@ -11,7 +11,7 @@ from typing import List, Optional
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, ORJSONResponse
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../app'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from fastapi import WebSocket
@@ -23,6 +23,7 @@ from app.citation_parser.citation_extractor import CitationExtractor
 from app.bibliography.checker import BibliographyChecker
 from app.services.simple_analysis_service import SimpleAnalysisService
 from app.services.library_service import library_service
+from app.services.simple_source_processor import shutdown_parse_pool
 
 # Модели данных
 from enum import Enum
@@ -86,7 +87,8 @@ def clear_all_data():
 
 clear_all_data()
 
-app = FastAPI(title="Citation Checker API", version="1.0.0")
+# ORJSONResponse: ответы (в т.ч. с большим объемом кириллицы) сериализуются через orjson
+app = FastAPI(title="Citation Checker API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -97,6 +99,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+async def flush_library():
+    """Записывает отложенные изменения библиотеки и останавливает пул разбора перед остановкой"""
+    await library_service.flush()
+    shutdown_parse_pool()
+
 class AnalysisStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
@@ -240,11 +249,11 @@ async def update_source(source_id: str, update_data: dict):
 
         # Сохраняем обновление
         library_service.sources[user_id][source_index] = source_to_update
-        library_service._save_sources()
+        await library_service._save_source_async(user_id, source_to_update)
 
         # Обновляем кэш контента если нужно
         if 'content' in update_data and update_data['content']:
-            library_service._save_source_content(source_id, update_data['content'])
+            await library_service._save_source_content_async(source_id, update_data['content'])
 
         print(f"✅ Источник обновлен: {source_id}")
         print(f"   Новый заголовок: {source_to_update.get('title')}")
@@ -548,27 +557,14 @@ async def options_handler(rest_of_path: str):
     )
 
 @app.get("/api/library/sources")
-async def get_library_sources(query: Optional[str] = None, page: int = 1):
-    """Поиск в библиотеке"""
-    try:
-        user_id = "demo_user"
-        if query:
-            return await library_service.search_sources(user_id, query, page)
-        else:
-            return await library_service.get_user_sources(user_id, page)
-    except Exception as e:
-        logger.error(f"Error getting sources: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.get("/api/library/sources")
-async def get_library_sources(query: Optional[str] = None, page: int = 1):
+async def get_library_sources(query: Optional[str] = None, page: int = 1, page_size: int = 20):
     """Поиск в библиотеке"""
     try:
         user_id = "demo_user"
         if query:
-            return await library_service.search_sources(user_id, query, page)
+            return await library_service.search_sources(user_id, query, page, page_size)
         else:
-            return await library_service.get_user_sources(user_id, page)
+            return await library_service.get_user_sources(user_id, page, page_size)
     except Exception as e:
         logger.error(f"Error getting sources: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1296,7 +1292,7 @@ async def add_source_content(source_id: str, content_data: dict):
             raise HTTPException(status_code=400, detail="Контент не может быть пустым")
 
         # Сохраняем контент
-        library_service._save_source_content(source_id, content)
+        await library_service._save_source_content_async(source_id, content)
 
         return {
             "success": True,
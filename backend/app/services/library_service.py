@@ -1,4 +1,4 @@
-import json
+import asyncio
 import os
 import uuid
 from datetime import datetime
@@ -7,17 +7,96 @@ from pathlib import Path
 import re
 import os
 import hashlib
+import heapq
 import logging
-from app.document_parser.universal_parser import UniversalDocumentParser
+import sqlite3
+import sys
+import tempfile
+import threading
+from contextlib import suppress
+from collections import OrderedDict
+import orjson
 from app.services.simple_source_processor import SimpleSourceProcessor
 
 
+# Размер страницы в списках источников
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Длина хэша файла для поиска дубликатов (SHA-256; старые записи хранят 8 символов MD5)
+FILE_HASH_LENGTH = 16
+LEGACY_FILE_HASH_LENGTH = 8
+UPLOAD_HASH_CHUNK_SIZE = 1 << 20  # 1 МБ
+
+# Предел памяти под кэш текстов источников
+CONTENT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Задержка, за которую накапливаются обновления last_used перед одной пакетной записью
+LAST_USED_FLUSH_DELAY = 0.5  # секунд
+
+
+# Разделитель полей в поисковой строке источника: в запросе его быть не может,
+# поэтому совпадение никогда не "склеивает" два соседних поля
+_SEARCH_FIELD_SEPARATOR = '\x00'
+
+
+def _trigrams(text: str) -> set:
+    """Множество триграмм строки (для индекса поиска по подстроке)"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _ContentCache:
+    """LRU-кэш текстов источников, ограниченный суммарным размером в байтах, а не числом записей"""
+
+    def __init__(self, max_bytes: int, on_evict=None):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._on_evict = on_evict
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, key):
+        value = self._items[key]
+        self._items.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        return self[key]
+
+    def __setitem__(self, key, value):
+        self.pop(key)
+        self._items[key] = value
+        self._size += sys.getsizeof(value)
+        # Последняя добавленная запись остается, даже если она одна больше предела
+        while self._size > self.max_bytes and len(self._items) > 1:
+            evicted_key, evicted = self._items.popitem(last=False)
+            self._size -= sys.getsizeof(evicted)
+            if self._on_evict:
+                self._on_evict(evicted_key)
+
+    def pop(self, key, default=None):
+        if key not in self._items:
+            return default
+        value = self._items.pop(key)
+        self._size -= sys.getsizeof(value)
+        return value
+
+
 class LibraryService:
     def __init__(self):
         self.base_dir = Path(__file__).parent.parent.parent
         self.data_dir = self.base_dir / "data" / "library"
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Старый JSON-файл читается только для однократного переноса в базу
         self.sources_file = self.data_dir / "bibliography_sources.json"
+        self.db_file = self.data_dir / "library.db"
 
         # ⭐ ВАЖНО: content_dir, а не contents_dir
         self.content_dir = self.data_dir / "contents"
@@ -30,8 +109,40 @@ class LibraryService:
 
         self.logger = logging.getLogger(__name__)
         self.source_processor = SimpleSourceProcessor()
+        # Один экземпляр парсера на сервис (общий с процессором источников), а не новый на каждый файл
+        self.document_parser = self.source_processor.document_parser
+        self._db_lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._init_db()
         self.sources = self._load_sources()
-        self.content_cache = {}  # Кэш для быстрого доступа
+        # Индекс записей: user_id -> source_id -> запись (те же объекты, что и в self.sources)
+        self._source_index = {}
+        # Индексы хэшей файлов для поиска дубликатов: user_id -> file_hash -> source_id
+        # (старые 8-символьные MD5 хранятся отдельно, чтобы знать, нужно ли считать MD5)
+        self._hash_index = {}
+        self._legacy_hash_index = {}
+        for user_id, user_sources in self.sources.items():
+            for source in user_sources:
+                self._index_source(user_id, source)
+        # Множества слов очищенного текста источников: source_id -> frozenset (для проверки ключевых слов)
+        self._content_words = {}
+        # Кэш текстов источников (ограничен по памяти; вместе с текстом вытесняется и множество слов)
+        self.content_cache = _ContentCache(CONTENT_CACHE_MAX_BYTES,
+                                           on_evict=lambda key: self._content_words.pop(key, None))
+        # Индекс поиска: user_id -> триграмма -> id источников (строится лениво, сбрасывается при сохранении)
+        self._search_index = {}
+        # Поисковые строки источников (поля в нижнем регистре через разделитель): source_id -> строка.
+        # Не хранятся в самих записях, чтобы не попадать в ответы API и в базу; сбрасываются при сохранении
+        self._search_blobs = {}
+        # Последний поиск пользователя: user_id -> (запрос в нижнем регистре, id найденных источников).
+        # Если новый запрос содержит прежний, искать можно только среди прежних результатов
+        self._last_search = {}
+        # Источники пользователя по дате добавления (новые сначала): user_id -> список.
+        # Строится лениво, сбрасывается при сохранении/удалении, как и индекс поиска
+        self._sorted_sources = {}
+        # Отложенные обновления last_used: source_id -> user_id (пишутся одной транзакцией)
+        self._dirty_sources = {}
+        self._flush_task = None
 
     async def add_source_from_file(self, user_id: str, file) -> Dict[str, Any]:
         """Добавляет источник из загруженного файла"""
@@ -39,18 +150,37 @@ class LibraryService:
             print(f"Adding source from file: {file.filename}")
 
             # Генерируем уникальный ID на основе содержимого файла
-            content = await file.read()
-            file_hash = hashlib.md5(content).hexdigest()[:8]
+            # Хэшируем файл по частям, не держа его целиком в памяти
+            # SHA-256 (аппаратное ускорение через OpenSSL) вместо MD5
+            hasher = hashlib.sha256()
+            # Старые записи хранят 8 символов MD5 - считаем его только при наличии таких записей
+            legacy_hashes = self._legacy_hash_index.get(user_id)
+            legacy_hasher = hashlib.md5() if legacy_hashes else None
+            while True:
+                chunk = await file.read(UPLOAD_HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                if legacy_hasher is not None:
+                    legacy_hasher.update(chunk)
+            file_hash = hasher.hexdigest()[:FILE_HASH_LENGTH]
+            legacy_hash = legacy_hasher.hexdigest()[:LEGACY_FILE_HASH_LENGTH] if legacy_hasher else None
 
             # Проверяем, нет ли уже такого файла
-            if user_id in self.sources:
-                for existing_source in self.sources[user_id]:
-                    if existing_source.get('file_hash') == file_hash:
-                        return {
-                            "success": False,
-                            "message": "Такой файл уже существует в библиотеке",
-                            "source_id": existing_source['id']
-                        }
+            existing_id = self._hash_index.get(user_id, {}).get(file_hash)
+            if existing_id is None and legacy_hash is not None:
+                existing_id = legacy_hashes.pop(legacy_hash, None)
+                if existing_id is not None:
+                    # Переводим запись на новый хэш
+                    existing_source = self.get_source_by_id(user_id, existing_id)
+                    existing_source['file_hash'] = file_hash
+                    await self._save_source_async(user_id, existing_source)
+            if existing_id is not None:
+                return {
+                    "success": False,
+                    "message": "Такой файл уже существует в библиотеке",
+                    "source_id": existing_id
+                }
 
             # Возвращаем указатель файла в начало для обработки
             await file.seek(0)
@@ -69,10 +199,9 @@ class LibraryService:
             source_id = process_result['file_id']
             text_content = process_result.get('text_content', '')
 
-            # ДЕТАЛЬНОЕ ЛОГИРОВАНИЕ ДЛЯ ОТЛАДКИ
-            print(f"DEBUG: Text content length: {len(text_content)}")
-            print(f"DEBUG: Text content preview (first 500): {text_content[:500]}")
-            print(f"DEBUG: Has text content: {bool(text_content.strip())}")
+            # ДЕТАЛЬНОЕ ЛОГИРОВАНИЕ ДЛЯ ОТЛАДКИ (форматируется, только если включен уровень DEBUG)
+            self.logger.debug("Text content length: %d", len(text_content))
+            self.logger.debug("Text content preview (first 500): %.500s", text_content)
 
             # Полный текст для сохранения
             full_text_content = text_content if text_content else ""
@@ -110,12 +239,13 @@ class LibraryService:
                 self.sources[user_id] = []
 
             self.sources[user_id].append(source_data)
-            self._save_sources()
+            self._index_source(user_id, source_data)
+            await self._save_source_async(user_id, source_data)
 
             # Также сохраняем полный текст в отдельный файл
             if full_text_content.strip():
-                self._save_source_content(source_id, full_text_content)
-                print(f"DEBUG: Full content saved for source {source_id}")
+                await self._save_source_content_async(source_id, full_text_content)
+                self.logger.debug("Full content saved for source %s", source_id)
             else:
                 print(f"WARNING: No text content to save for source {source_id}")
 
@@ -129,63 +259,44 @@ class LibraryService:
             }
 
         except Exception as e:
-            print(f"Error adding source from file: {e}")
-            import traceback
-            traceback.print_exc()
+            self.logger.exception("Error adding source from file: %s", e)
             return {
                 "success": False,
                 "message": f"Ошибка при добавлении источника из файла: {str(e)}"
             }
 
-    async def _extract_content_from_file(self, file_path: str) -> Optional[str]:
-        """Извлекает текст из файла источника"""
-        try:
-            document = self.document_parser.parse_document(file_path)
-            if document and document.main_content:
-                # Объединяем весь текст из блоков контента
-                full_text = ""
-                for block in document.main_content:
-                    if hasattr(block, 'text') and block.text:
-                        full_text += block.text + "\n\n"
-                return full_text.strip()
-            return None
-        except Exception as e:
-            print(f"Error extracting content from file {file_path}: {e}")
-            return None
-
-    def _load_data(self) -> Dict[str, List[Dict]]:
-        """Загружает данные из файла"""
-        try:
-            if self.data_file.exists():
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
-        except Exception as e:
-            print(f"Error loading library data: {e}")
-            return {}
+    def _write_content_file(self, source_id: str, content: str) -> Path:
+        """Пишет текст источника в файл (только файловые операции - можно вызывать из отдельного потока)"""
+        self.content_dir.mkdir(parents=True, exist_ok=True)
 
-    def _save_data(self):
-        """Сохраняет данные в файл"""
+        # Пишем во временный файл и атомарно подменяем: при сбое не остается обрезанного текста.
+        # Имя временного файла уникально, чтобы параллельные сохранения одного источника не мешали друг другу
+        content_file = self.content_dir / f"{source_id}.txt"
+        tmp_file = tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.content_dir,
+                                               prefix=f"{source_id}.", suffix='.tmp', delete=False)
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.user_sources, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error saving library data: {e}")
+            with tmp_file:
+                tmp_file.write(content)
+            os.replace(tmp_file.name, content_file)
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(tmp_file.name)
+            raise
+        return content_file
+
+    def _cache_saved_content(self, source_id: str, content: str):
+        """Обновляет кэш текста после сохранения (только в event loop)"""
+        self.content_cache[source_id] = content
+        self._content_words.pop(source_id, None)
 
     def _save_source_content(self, source_id: str, content: str):
         """Сохраняет полный текст источника"""
         try:
-            self.content_dir.mkdir(parents=True, exist_ok=True)
-
-            content_file = self.content_dir / f"{source_id}.txt"
-            with open(content_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-
-            print(f"   💾 Контент сохранен для источника {source_id}: {len(content)} символов")
-            print(f"   📁 Путь: {content_file}")
+            content_file = self._write_content_file(source_id, content)
+            self.logger.debug("Контент сохранен для источника %s: %d символов (%s)", source_id, len(content), content_file)
 
             # Обновляем кэш
-            self.content_cache[source_id] = content
+            self._cache_saved_content(source_id, content)
 
             # Обновляем запись источника
             self._update_source_has_content(source_id, True)
@@ -193,35 +304,55 @@ class LibraryService:
         except Exception as e:
             print(f"   ❌ Ошибка сохранения контента: {e}")
 
+    async def _save_source_content_async(self, source_id: str, content: str):
+        """Сохраняет полный текст источника: файл пишется в отдельном потоке, кэши и запись обновляются в event loop"""
+        try:
+            content_file = await asyncio.to_thread(self._write_content_file, source_id, content)
+        except Exception as e:
+            print(f"   ❌ Ошибка сохранения контента: {e}")
+            return
+        self.logger.debug("Контент сохранен для источника %s: %d символов (%s)", source_id, len(content), content_file)
+
+        self._cache_saved_content(source_id, content)
+
+        owner = self._mark_source_has_content(source_id, True)
+        if owner is not None:
+            await self._save_source_async(*owner)
+
+    def _mark_source_has_content(self, source_id: str, has_content: bool):
+        """Проставляет has_content/text_length в записи источника; возвращает (user_id, запись) или None"""
+        for user_id, user_index in self._source_index.items():
+            source = user_index.get(source_id)
+            if source is not None:
+                source['has_content'] = has_content
+                if has_content:
+                    source['text_length'] = len(self.content_cache.get(source_id, ''))
+                print(f"   🔄 Обновлен флаг has_content для {source_id}: {has_content}")
+                return user_id, source
+        return None
+
     def _update_source_has_content(self, source_id: str, has_content: bool):
         """Обновляет флаг has_content в источнике"""
-        for user_id, sources in self.sources.items():
-            for source in sources:
-                if source['id'] == source_id:
-                    source['has_content'] = has_content
-                    if has_content:
-                        source['text_length'] = len(self.content_cache.get(source_id, ''))
-                    self._save_sources()
-                    print(f"   🔄 Обновлен флаг has_content для {source_id}: {has_content}")
-                    return
+        owner = self._mark_source_has_content(source_id, has_content)
+        if owner is not None:
+            self._save_source(*owner)
 
     def _load_source_content(self, source_id: str) -> Optional[str]:
         """Загружает контент источника"""
         # Сначала проверяем кэш
         if source_id in self.content_cache:
-            print(f"   🔄 Используем кэшированный контент для {source_id}")
+            self.logger.debug("Используем кэшированный контент для %s", source_id)
             return self.content_cache[source_id]
 
         content_path = self.content_dir / f"{source_id}.txt"
 
-        print(f"   📄 Загружаем контент из: {content_path}")
-        print(f"   📄 Файл существует: {content_path.exists()}")
+        self.logger.debug("Загружаем контент из: %s", content_path)
 
         if content_path.exists():
             try:
                 with open(content_path, 'r', encoding='utf-8') as f:
                     content = f.read()
-                    print(f"   ✅ Загружено {len(content)} символов для источника {source_id}")
+                    self.logger.debug("Загружено %d символов для источника %s", len(content), source_id)
                     # Кэшируем
                     self.content_cache[source_id] = content
                     return content
@@ -275,11 +406,12 @@ class LibraryService:
             }
 
             self.sources[user_id].append(full_source)
-            self._save_sources()
+            self._index_source(user_id, full_source)
+            await self._save_source_async(user_id, full_source)
 
             # Сохраняем содержание если есть
             if content:
-                self._save_source_content(full_source['id'], content)
+                await self._save_source_content_async(full_source['id'], content)
 
             return {
                 "success": True,
@@ -293,16 +425,16 @@ class LibraryService:
                 "message": f"Ошибка при добавлении источника: {str(e)}"
             }
 
-    async def get_user_sources(self, user_id: str, page: int = 1) -> Dict[str, Any]:
+    async def get_user_sources(self, user_id: str, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
         """Получает все источники пользователя"""
         try:
             user_sources = self.sources.get(user_id, [])
 
-            # Сортируем по дате добавления (новые сначала)
-            sorted_sources = sorted(user_sources, key=lambda x: x['created_at'], reverse=True)
+            # Отсортированный по дате добавления (новые сначала) список, без сортировки на каждый запрос
+            sorted_sources = self._get_sorted_sources(user_id)
 
             # Пагинация
-            limit = 20
+            limit = max(1, min(page_size, MAX_PAGE_SIZE))
             start_idx = (page - 1) * limit
             end_idx = start_idx + limit
             paginated_sources = sorted_sources[start_idx:end_idx]
@@ -320,30 +452,43 @@ class LibraryService:
                 "message": f"Ошибка при получении источников: {str(e)}"
             }
 
-    async def search_sources(self, user_id: str, query: str, page: int = 1) -> Dict[str, Any]:
+    async def search_sources(self, user_id: str, query: str, page: int = 1,
+                             page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
         """Поиск источников в библиотеке пользователя"""
         try:
             user_sources = self.sources.get(user_id, [])
 
             filtered_sources = []
             query_lower = query.lower()
+            if _SEARCH_FIELD_SEPARATOR in query_lower:
+                user_sources = []
+
+            # Кандидаты по индексу триграмм: подстрока длиной от 3 символов
+            # может встретиться только там, где есть все её триграммы
+            candidate_ids = None
+            if len(query_lower) >= 3:
+                index = self._get_search_index(user_id)
+                postings = sorted((index.get(t, set()) for t in _trigrams(query_lower)), key=len)
+                candidate_ids = set(postings[0]).intersection(*postings[1:])
+
+            # Уточнение предыдущего запроса (набор по буквам): подходят только прежние результаты
+            last_search = self._last_search.get(user_id)
+            if last_search and last_search[0] in query_lower:
+                candidate_ids = last_search[1] if candidate_ids is None else candidate_ids & last_search[1]
 
             for source in user_sources:
+                if candidate_ids is not None and source['id'] not in candidate_ids:
+                    continue
+
                 # Поиск по всем текстовым полям
-                search_fields = [
-                    source.get('title', ''),
-                    ' '.join(source.get('authors', [])),
-                    source.get('journal', ''),
-                    source.get('publisher', ''),
-                    source.get('doi', ''),
-                    source.get('custom_citation', '')
-                ]
-
-                if any(query_lower in str(field).lower() for field in search_fields if field):
+                if query_lower in self._source_search_blob(source):
                     filtered_sources.append(source)
 
+            if query_lower:
+                self._last_search[user_id] = (query_lower, frozenset(s['id'] for s in filtered_sources))
+
             # Пагинация
-            limit = 20
+            limit = max(1, min(page_size, MAX_PAGE_SIZE))
             start_idx = (page - 1) * limit
             end_idx = start_idx + limit
             paginated_sources = filtered_sources[start_idx:end_idx]
@@ -371,14 +516,15 @@ class LibraryService:
                     "message": "Библиотека пользователя не найдена"
                 }
 
-            initial_count = len(self.sources[user_id])
-            self.sources[user_id] = [
-                source for source in self.sources[user_id]
-                if source['id'] != source_id
-            ]
+            # Запись находим по индексу, из списка удаляем на месте, без копирования
+            source = self.get_source_by_id(user_id, source_id)
 
-            if len(self.sources[user_id]) < initial_count:
-                self._save_sources()
+            if source is not None:
+                self._unindex_source(user_id, source)
+                user_sources = self.sources[user_id]
+                del user_sources[next(i for i, s in enumerate(user_sources) if s is source)]
+                self._forget_source(user_id, source_id)
+                await asyncio.to_thread(self._delete_source_row, source_id)
 
                 # Также удаляем файл с текстом
                 try:
@@ -405,33 +551,216 @@ class LibraryService:
                 "message": f"Ошибка при удалении источника: {str(e)}"
             }
 
+    def _hash_index_for(self, file_hash: str) -> Dict[str, Dict[str, str]]:
+        """Индекс, в котором хранится хэш данного вида (SHA-256 или старый MD5)"""
+        return self._legacy_hash_index if len(file_hash) == LEGACY_FILE_HASH_LENGTH else self._hash_index
+
+    def _index_source(self, user_id: str, source: Dict[str, Any]):
+        """Регистрирует запись в индексах по id и по хэшу файла"""
+        self._source_index.setdefault(user_id, {})[source['id']] = source
+        file_hash = source.get('file_hash')
+        if file_hash:
+            self._hash_index_for(file_hash).setdefault(user_id, {})[file_hash] = source['id']
+
+    def _unindex_source(self, user_id: str, source: Dict[str, Any]):
+        """Убирает запись из индексов по id и по хэшу файла"""
+        self._source_index.get(user_id, {}).pop(source['id'], None)
+        file_hash = source.get('file_hash')
+        if file_hash:
+            self._hash_index_for(file_hash).get(user_id, {}).pop(file_hash, None)
+
+    def get_source_by_id(self, user_id: str, source_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает запись источника пользователя по id (O(1) через индекс)"""
+        return self._source_index.get(user_id, {}).get(source_id)
+
+    def _source_search_blob(self, source: Dict[str, Any]) -> str:
+        """Поисковая строка источника: текстовые поля в нижнем регистре одной строкой (кэшируется)"""
+        cached = self._search_blobs.get(source['id'])
+        if cached is not None:
+            return cached
+
+        search_fields = [
+            source.get('title', ''),
+            ' '.join(source.get('authors', [])),
+            source.get('journal', ''),
+            source.get('publisher', ''),
+            source.get('doi', ''),
+            source.get('custom_citation', '')
+        ]
+        cached = _SEARCH_FIELD_SEPARATOR.join(str(field).lower() for field in search_fields if field)
+        self._search_blobs[source['id']] = cached
+        return cached
+
+    def _get_search_index(self, user_id: str) -> Dict[str, set]:
+        """Возвращает (при необходимости строит) индекс триграмм источников пользователя"""
+        index = self._search_index.get(user_id)
+        if index is None:
+            index = {}
+            for source in self.sources.get(user_id, []):
+                for trigram in _trigrams(self._source_search_blob(source)):
+                    index.setdefault(trigram, set()).add(source['id'])
+            self._search_index[user_id] = index
+        return index
+
+    def _get_sorted_sources(self, user_id: str) -> List[Dict[str, Any]]:
+        """Возвращает (при необходимости строит) источники пользователя, новые сначала"""
+        user_sources = self.sources.get(user_id, [])
+        sorted_sources = self._sorted_sources.get(user_id)
+        # Сверка длины страхует от прямых правок self.sources в обход _save_source
+        if sorted_sources is None or len(sorted_sources) != len(user_sources):
+            sorted_sources = sorted(user_sources, key=lambda x: x['created_at'], reverse=True)
+            self._sorted_sources[user_id] = sorted_sources
+        return sorted_sources
+
+    def _init_db(self):
+        """Создает таблицу источников: одна строка на источник вместо общего JSON-файла"""
+        with self._db_lock:
+            # WAL: чтение не блокируется записью; synchronous=NORMAL - без fsync на каждый коммит
+            # (в режиме WAL это безопасно для целостности базы)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                "id TEXT PRIMARY KEY, "
+                "user_id TEXT NOT NULL, "
+                "data TEXT NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_sources_user ON sources(user_id)")
+            self.db.commit()
+
+    def _migrate_json_sources(self):
+        """Однократно переносит источники из старого bibliography_sources.json в базу"""
+        if not self.sources_file.exists():
+            return
+        with open(self.sources_file, 'rb') as f:
+            legacy = orjson.loads(f.read())
+        rows = [
+            (source['id'], user_id, orjson.dumps(source).decode())
+            for user_id, user_sources in legacy.items()
+            for source in user_sources
+        ]
+        with self._db_lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO sources (id, user_id, data) VALUES (?, ?, ?)", rows
+            )
+            self.db.commit()
+        # Переименовываем файл, чтобы перенос не повторялся
+        self.sources_file.rename(self.sources_file.with_suffix('.json.migrated'))
+        print(f"Migrated {len(rows)} sources from {self.sources_file} to database")
+
     def _load_sources(self) -> Dict[str, List[Dict]]:
-        """Загружает источники из файла"""
+        """Загружает источники из базы"""
         try:
-            if self.sources_file.exists():
-                with open(self.sources_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    print(f"Loaded {sum(len(v) for v in data.values())} sources from file")
-                    return data
-            return {}
+            self._migrate_json_sources()
+            data = {}
+            rows = self.db.execute("SELECT user_id, data FROM sources ORDER BY rowid").fetchall()
+            for user_id, raw in rows:
+                data.setdefault(user_id, []).append(orjson.loads(raw))
+            print(f"Loaded {len(rows)} sources from database")
+            return data
         except Exception as e:
             print(f"Error loading sources: {e}")
             return {}
 
-    def _save_sources(self):
-        """Сохраняет источники в файл"""
+    def _reindex_saved_source(self, user_id: str, source: Dict[str, Any]):
+        """Сбрасывает кэши пользователя и переиндексирует сохраняемую запись (только в event loop)"""
+        # Источники изменились - индекс поиска и сортировка пользователя перестраиваются при следующем запросе
+        self._search_index.pop(user_id, None)
+        self._sorted_sources.pop(user_id, None)
+        self._last_search.pop(user_id, None)
+        self._search_blobs.pop(source['id'], None)
+        # Запись могли заменить копией (main.update_source) - индекс указывает на актуальный объект
+        self._index_source(user_id, source)
+
+    def _write_source_row(self, source_id: str, user_id: str, data: str):
+        """Пишет сериализованную запись источника в базу (можно вызывать из отдельного потока)"""
         try:
-            with open(self.sources_file, 'w', encoding='utf-8') as f:
-                json.dump(self.sources, f, ensure_ascii=False, indent=2)
-            print(f"Saved sources to {self.sources_file}")
+            with self._db_lock:
+                # UPSERT сохраняет rowid, поэтому порядок источников не меняется
+                self.db.execute(
+                    "INSERT INTO sources (id, user_id, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                    (source_id, user_id, data)
+                )
+                self.db.commit()
         except Exception as e:
-            print(f"Error saving sources: {e}")
+            print(f"Error saving source {source_id}: {e}")
+
+    def _save_source(self, user_id: str, source: Dict[str, Any]):
+        """Сохраняет (вставляет или обновляет) одну запись источника"""
+        self._reindex_saved_source(user_id, source)
+        self._write_source_row(source['id'], user_id, orjson.dumps(source).decode())
+
+    async def _save_source_async(self, user_id: str, source: Dict[str, Any]):
+        """Сохраняет запись источника: кэши и сериализация - в event loop, запись в базу - в отдельном потоке"""
+        self._reindex_saved_source(user_id, source)
+        data = orjson.dumps(source).decode()
+        await asyncio.to_thread(self._write_source_row, source['id'], user_id, data)
+
+    def _write_last_used(self, rows: List[tuple]):
+        """Пакетно обновляет last_used одной транзакцией (только это поле, без пересериализации записи)"""
+        try:
+            with self._db_lock:
+                self.db.executemany(
+                    "UPDATE sources SET data = json_set(data, '$.last_used', ?) WHERE id = ?",
+                    rows
+                )
+                self.db.commit()
+        except Exception as e:
+            print(f"Error saving sources batch: {e}")
+
+    def _schedule_flush(self):
+        """Планирует отложенную запись накопленных изменений"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(LAST_USED_FLUSH_DELAY)
+        # Пока flush ждал записи в базу, могли появиться новые изменения: задача еще не завершена,
+        # поэтому новая не планировалась - записываем их здесь же, а не до следующего вызова
+        while self._dirty_sources:
+            await self.flush()
+
+    async def flush(self):
+        """Записывает в базу все отложенные изменения (вызывается и при остановке приложения)"""
+        if not self._dirty_sources:
+            return
+        dirty, self._dirty_sources = self._dirty_sources, {}
+        rows = []
+        for source_id, user_id in dirty.items():
+            source = self.get_source_by_id(user_id, source_id)
+            if source is not None:  # источник могли удалить до записи
+                rows.append((source['last_used'], source_id))
+        if rows:
+            await asyncio.to_thread(self._write_last_used, rows)
+
+    def _forget_source(self, user_id: str, source_id: str):
+        """Сбрасывает кэши, связанные с удаляемым источником (только в event loop)"""
+        self._search_index.pop(user_id, None)
+        self._sorted_sources.pop(user_id, None)
+        self._last_search.pop(user_id, None)
+        self._search_blobs.pop(source_id, None)
+        self._content_words.pop(source_id, None)
+
+    def _delete_source_row(self, source_id: str):
+        """Удаляет запись источника из базы (можно вызывать из отдельного потока)"""
+        try:
+            with self._db_lock:
+                self.db.execute("DELETE FROM sources WHERE id = ?", (source_id,))
+                self.db.commit()
+        except Exception as e:
+            print(f"Error deleting source {source_id}: {e}")
+
+    def _save_sources(self):
+        """Полная синхронизация всех источников с базой (для внешних правок self.sources)"""
+        for user_id, user_sources in self.sources.items():
+            for source in user_sources:
+                self._save_source(user_id, source)
 
     async def get_source_details(self, user_id: str, source_id: str) -> Dict[str, Any]:
         """Получает детальную информацию об источнике"""
         try:
-            user_sources = self.sources.get(user_id, [])
-            source = next((s for s in user_sources if s['id'] == source_id), None)
+            source = self.get_source_by_id(user_id, source_id)
 
             if not source:
                 print(f"   ❌ Источник {source_id} не найден для пользователя {user_id}")
@@ -440,15 +769,13 @@ class LibraryService:
                     "message": "Источник не найден"
                 }
 
-            print(f"   🔍 Загружаем детали для источника: {source_id}")
-            print(f"   📖 Название: {source.get('title', 'Без названия')}")
+            self.logger.debug("Загружаем детали для источника: %s (%s)", source_id, source.get('title', 'Без названия'))
 
             # Загружаем полное содержание
             full_content = self._load_source_content(source_id)
 
             if full_content:
-                print(f"   ✅ Контент загружен: {len(full_content)} символов")
-                print(f"   📝 Превью: {full_content[:200]}...")
+                self.logger.debug("Контент загружен: %d символов, превью: %.200s", len(full_content), full_content)
 
                 # Обновляем запись
                 source['has_content'] = True
@@ -467,7 +794,7 @@ class LibraryService:
 
                         if reextracted_text and reextracted_text.strip():
                             print(f"   ✅ Извлечен текст: {len(reextracted_text)} символов")
-                            self._save_source_content(source_id, reextracted_text)
+                            await self._save_source_content_async(source_id, reextracted_text)
                             full_content = reextracted_text
                         else:
                             print(f"   ❌ Не удалось извлечь текст из файла")
@@ -503,16 +830,9 @@ class LibraryService:
                 }
 
             # Ищем источник
-            source_index = -1
-            source_to_update = None
-
-            for i, source in enumerate(self.sources[user_id]):
-                if source['id'] == source_id:
-                    source_index = i
-                    source_to_update = source
-                    break
+            source_to_update = self.get_source_by_id(user_id, source_id)
 
-            if source_index == -1:
+            if source_to_update is None:
                 return {
                     "success": False,
                     "message": "Источник не найден"
@@ -541,8 +861,8 @@ class LibraryService:
             # Текстовый файл содержит только реальное содержание источника
             # Метаданные хранятся отдельно в JSON
 
-            # Сохраняем только метаданные в JSON
-            self._save_sources()
+            # Сохраняем только метаданные (одна строка в базе)
+            await self._save_source_async(user_id, source_to_update)
 
             print(f"Source {source_id} updated successfully (metadata only)")
 
@@ -553,9 +873,7 @@ class LibraryService:
             }
 
         except Exception as e:
-            print(f"Error updating source: {e}")
-            import traceback
-            traceback.print_exc()
+            self.logger.exception("Error updating source: %s", e)
             return {
                 "success": False,
                 "message": f"Ошибка при обновлении источника: {str(e)}"
@@ -564,9 +882,7 @@ class LibraryService:
     async def _extract_content_from_file(self, file_path: str) -> Optional[str]:
         """Извлекает текст из файла источника"""
         try:
-            from app.document_parser.universal_parser import UniversalDocumentParser
-            parser = UniversalDocumentParser()
-            document = parser.parse_document(file_path)
+            document = await asyncio.to_thread(self.document_parser.parse_document, file_path)
 
             if document and document.main_content:
                 full_text = ""
@@ -582,8 +898,7 @@ class LibraryService:
     async def get_source_content(self, user_id: str, source_id: str) -> Dict[str, Any]:
         """Получает содержание источника"""
         try:
-            user_sources = self.sources.get(user_id, [])
-            source = next((s for s in user_sources if s['id'] == source_id), None)
+            source = self.get_source_by_id(user_id, source_id)
 
             if not source:
                 return {
@@ -627,14 +942,14 @@ class LibraryService:
                 processor = SimpleSourceProcessor()
                 content = await processor.extract_text_from_file(source["source"]["file_path"])
                 if content:
-                    self._save_source_content(source_id, content)
+                    await self._save_source_content_async(source_id, content)
                     self.content_cache[source_id] = content
                     return content
 
             return None
 
         except Exception as e:
-            logger.error(f"Error getting source content async: {e}")
+            self.logger.error(f"Error getting source content async: {e}")
             return None
 
     async def get_source_details_async(self, user_id: str, source_id: str) -> Optional[Dict]:
@@ -642,8 +957,7 @@ class LibraryService:
         Асинхронно получает детали источника
         """
         try:
-            user_sources = self.sources.get(user_id, [])
-            source = next((s for s in user_sources if s['id'] == source_id), None)
+            source = self.get_source_by_id(user_id, source_id)
 
             if not source:
                 return None
@@ -654,7 +968,7 @@ class LibraryService:
             }
 
         except Exception as e:
-            logger.error(f"Error getting source details async: {e}")
+            self.logger.error(f"Error getting source details async: {e}")
             return None
 
     async def verify_citation_content(self, user_id: str, citation_text: str, source_id: str) -> Dict[str, Any]:
@@ -672,8 +986,15 @@ class LibraryService:
             citation_text_clean = self._clean_text(citation_text)
             source_content_clean = self._clean_text(source_content)
 
+            # Слова источника разбиваются в множество один раз и переиспользуются между проверками
+            source_words = self._content_words.get(source_id)
+            if source_words is None:
+                source_words = frozenset(source_content_clean.split())
+                self._content_words[source_id] = source_words
+
             # Проверяем различные типы совпадений
-            verification_result = self._check_content_matches(citation_text_clean, source_content_clean)
+            verification_result = self._check_content_matches(citation_text_clean, source_content_clean,
+                                                              source_words)
 
             return {
                 "success": True,
@@ -694,20 +1015,29 @@ class LibraryService:
         if not text:
             return ""
         # Убираем лишние пробелы, приводим к нижнему регистру
-        text = re.sub(r'\s+', ' ', text.strip().lower())
+        text = ' '.join(text.lower().split())
         return text
 
-    def _check_content_matches(self, citation: str, source_content: str) -> Dict[str, Any]:
+    def _check_content_matches(self, citation: str, source_content: str,
+                               source_words: Optional[frozenset] = None) -> Dict[str, Any]:
         """Проверяет различные типы совпадений между цитатой и содержанием"""
 
-        # 1. Точное совпадение
+        # 1. Точное совпадение: дословная цитата подтверждена, поиск похожих фраз не нужен
         exact_match = citation in source_content
+        if exact_match and citation:
+            return {
+                "exact_match": True,
+                "similar_matches": [],
+                "keyword_matches": self._check_keywords(citation, source_content, source_words),
+                "confidence_score": 1.0,
+                "issues": []
+            }
 
         # 2. Поиск похожих фраз (упрощенный подход)
         similar_matches = self._find_similar_phrases(citation, source_content)
 
         # 3. Проверка ключевых слов
-        keyword_matches = self._check_keywords(citation, source_content)
+        keyword_matches = self._check_keywords(citation, source_content, source_words)
 
         # Расчет уверенности
         confidence = self._calculate_confidence(exact_match, similar_matches, keyword_matches)
@@ -729,34 +1059,61 @@ class LibraryService:
         citation_words = [word for word in citation.split() if len(word) > 2]
         source_words = source_content.split()
 
-        matches = []
         window_size = min(10, len(citation_words) + 5)
+        citation_set = set(citation_words)
+        denominator = max(len(citation_words), 1)
+        if len(source_words) < window_size or not citation_set:
+            return []
 
+        # Скользящее окно: счетчики слов цитаты внутри окна и число различных общих слов
+        # обновляются на каждом шаге за O(1) вместо построения множества окна заново
+        counts = {}
+        common = 0
+        for word in source_words[:window_size]:
+            if word in citation_set:
+                if not counts.get(word):
+                    common += 1
+                counts[word] = counts.get(word, 0) + 1
+
+        candidates = []
         for i in range(len(source_words) - window_size + 1):
-            window = source_words[i:i + window_size]
-            window_text = ' '.join(window)
-            window_words = set(window)
+            if i:
+                removed = source_words[i - 1]
+                if removed in citation_set:
+                    counts[removed] -= 1
+                    if not counts[removed]:
+                        common -= 1
+                added = source_words[i + window_size - 1]
+                if added in citation_set:
+                    if not counts.get(added):
+                        common += 1
+                    counts[added] = counts.get(added, 0) + 1
 
             # Простой расчет схожести
-            common_words = set(citation_words).intersection(window_words)
-            similarity = len(common_words) / max(len(citation_words), 1)
-
+            similarity = common / denominator
             if similarity > 0.3:  # Порог схожести
-                matches.append({
-                    "text": window_text,
-                    "similarity": similarity,
-                    "position": i
-                })
-
-        return sorted(matches, key=lambda x: x["similarity"], reverse=True)[:5]  # Топ-5 совпадений
+                candidates.append((similarity, i))
+
+        # Топ-5 совпадений (при равной схожести - по позиции); текст окна собираем только для них
+        top = heapq.nsmallest(5, candidates, key=lambda c: (-c[0], c[1]))
+        return [
+            {
+                "text": ' '.join(source_words[i:i + window_size]),
+                "similarity": similarity,
+                "position": i
+            }
+            for similarity, i in top
+        ]
 
-    def _check_keywords(self, citation: str, source_content: str) -> Dict[str, Any]:
+    def _check_keywords(self, citation: str, source_content: str,
+                        source_words: Optional[frozenset] = None) -> Dict[str, Any]:
         """Проверяет совпадение ключевых слов"""
         if not citation or not source_content:
             return {"matching": [], "missing": [], "coverage": 0}
 
         citation_words = set([word for word in citation.split() if len(word) > 3])
-        source_words = set(source_content.split())
+        if source_words is None:
+            source_words = set(source_content.split())
 
         matching_keywords = citation_words.intersection(source_words)
         missing_keywords = citation_words - source_words
@@ -806,12 +1163,13 @@ class LibraryService:
     async def update_source_last_used(self, user_id: str, source_id: str) -> bool:
         """Обновляет время последнего использования источника"""
         try:
-            if user_id in self.sources:
-                for source in self.sources[user_id]:
-                    if source['id'] == source_id:
-                        source['last_used'] = datetime.now().isoformat()
-                        self._save_sources()
-                        return True
+            source = self.get_source_by_id(user_id, source_id)
+            if source is not None:
+                source['last_used'] = datetime.now().isoformat()
+                # last_used меняется при каждой проверке - копим изменения и пишем их пачкой
+                self._dirty_sources[source_id] = user_id
+                self._schedule_flush()
+                return True
             return False
         except Exception as e:
             print(f"Error updating source last used: {e}")
@@ -820,8 +1178,8 @@ class LibraryService:
     async def get_source_content_with_fallback(self, user_id: str, source_id: str):
         """Получает контент источника с отказоустойчивостью"""
         try:
-            # Сначала проверяем кэш
-            cache_key = f"{user_id}:{source_id}:content"
+            # Сначала проверяем кэш (ключ тот же, что и у _load_source_content - без дублирования текста)
+            cache_key = source_id
             if cache_key in self.content_cache:
                 return self.content_cache[cache_key]
 
@@ -843,7 +1201,7 @@ class LibraryService:
 
             return None
         except Exception as e:
-            logger.error(f"Error getting source content: {e}")
+            self.logger.error(f"Error getting source content: {e}")
             return None
 
 # Глобальный экземпляр сервиса
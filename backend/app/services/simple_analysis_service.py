@@ -1,4 +1,6 @@
 import asyncio
+import hashlib
+import threading
 import time
 import uuid
 import re
@@ -20,6 +22,24 @@ from app.verification.unreferenced_citation_checker import UnreferencedCitationC
 import logging
 import requests
 import json
+import orjson
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Граница предложений: пробелы после . ! ?
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Сколько разобранных документов держать в памяти (ключ - хэш содержимого файла)
+PARSED_DOCUMENT_CACHE_SIZE = 16
+FILE_HASH_CHUNK_SIZE = 1 << 20
+
+# Сколько проверок цитаты по источникам (TF-IDF, CPU) выполняется одновременно. Отдельный пул, а не
+# executor по умолчанию: он же занят analyze_document, а ждущие в очереди проверки отменяются вместе с задачей
+SEMANTIC_CHECK_MAX_WORKERS = 4
+_semantic_check_pool = ThreadPoolExecutor(max_workers=SEMANTIC_CHECK_MAX_WORKERS,
+                                          thread_name_prefix='semantic-check')
+
+
 class SimpleAnalysisService:
     def __init__(self):
         self.document_parser = UniversalDocumentParser()
@@ -27,6 +47,11 @@ class SimpleAnalysisService:
         self.bibliography_checker = BibliographyChecker()
         self.analysis_results: Dict[str, Dict[str, Any]] = {}
         self.analysis_status: Dict[str, Dict[str, Any]] = {}
+        # Разобранные документы по хэшу содержимого: повторная загрузка того же файла не парсится заново.
+        # Кэшируется только разбор - остальные шаги зависят от библиотеки и пересчитываются
+        self._parsed_documents = OrderedDict()
+        # analyze_document выполняется в потоках executor'а - кэш меняем под блокировкой
+        self._parsed_documents_lock = threading.Lock()
         self.semantic_matcher = semantic_matcher
         self.logger = logging.getLogger(__name__)
         self.misreference_checker = MisreferenceChecker()
@@ -38,18 +63,13 @@ class SimpleAnalysisService:
 
     def update_status(self, doc_id: str, stage: str, progress: int = 0):
         """Обновляет статус анализа"""
-        if doc_id not in self.analysis_status:
-            self.analysis_status[doc_id] = {
-                'stage': stage,
-                'progress': progress,
-                'last_update': time.time()
-            }
-        else:
-            self.analysis_status[doc_id].update({
-                'stage': stage,
-                'progress': progress,
-                'last_update': time.time()
-            })
+        # Новый словарь подменяется одним присваиванием: читатель из другого потока
+        # видит либо старый, либо новый статус целиком, без проверки наличия и update()
+        self.analysis_status[doc_id] = {
+            'stage': stage,
+            'progress': progress,
+            'last_update': time.time()
+        }
 
     def get_analysis_status(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """Получает статус анализа"""
@@ -100,11 +120,35 @@ class SimpleAnalysisService:
 
         return source_contents
 
+    def _parse_document_cached(self, file_path: str) -> ParsedDocument:
+        """Парсит документ, переиспользуя результат для файлов с тем же содержимым"""
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(FILE_HASH_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+        key = file_hash.hexdigest()
+
+        with self._parsed_documents_lock:
+            document = self._parsed_documents.get(key)
+            if document is not None:
+                self._parsed_documents.move_to_end(key)
+        if document is not None:
+            self.logger.debug("Документ уже разбирался - используем сохраненный результат")
+            return document
+
+        document = self.document_parser.parse_document(file_path)
+        if document is not None and document.main_content:
+            with self._parsed_documents_lock:
+                self._parsed_documents[key] = document
+                while len(self._parsed_documents) > PARSED_DOCUMENT_CACHE_SIZE:
+                    self._parsed_documents.popitem(last=False)
+        return document
+
     def analyze_document(self, file_path: str, doc_id: str) -> Dict[str, Any]:
         try:
-            print(f"НАЧИНАЕМ АНАЛИЗ ДОКУМЕНТА {doc_id}")
-            print(f"Файл: {file_path}")
-            print(f"Существует ли файл: {os.path.exists(file_path)}")
+            self.logger.info("НАЧИНАЕМ АНАЛИЗ ДОКУМЕНТА %s", doc_id)
+            self.logger.info("Файл: %s", file_path)
+            self.logger.info("Существует ли файл: %s", os.path.exists(file_path))
 
             import time
             start_time = time.time()
@@ -123,13 +167,13 @@ class SimpleAnalysisService:
             self.analysis_results[doc_id] = temp_result
 
             # 1. Парсинг документа
-            print(" Шаг 1: Парсим документ...")
+            self.logger.info("Шаг 1: Парсим документ...")
             try:
-                document = self.document_parser.parse_document(file_path)
-                print(f" Документ распарсен: {len(document.main_content or [])} блоков")
+                document = self._parse_document_cached(file_path)
+                self.logger.info("Документ распарсен: %s блоков", len(document.main_content or []))
 
                 if not document.main_content:
-                    print(" ВНИМАНИЕ: main_content пуст!")
+                    self.logger.info("ВНИМАНИЕ: main_content пуст!")
                     result = {
                         'doc_id': doc_id,
                         'status': 'completed',
@@ -159,9 +203,7 @@ class SimpleAnalysisService:
                     return result
 
             except Exception as e:
-                print(f" Ошибка парсинга: {e}")
-                import traceback
-                traceback.print_exc()
+                self.logger.exception("Ошибка парсинга: %s", e)
 
                 result = {
                     'doc_id': doc_id,
@@ -179,15 +221,14 @@ class SimpleAnalysisService:
                 return result
 
             # 2. Извлечение цитат
-            print(" Шаг 2: Извлекаем цитирования...")
+            self.logger.info("Шаг 2: Извлекаем цитирования...")
             try:
                 citations_result = self.citation_extractor.extract_citations(
                     document.main_content or []
                 )
-                print(f" Найдено цитат: {citations_result.get('total_unique', 0)}")
-                print(f" Примеры цитат: {citations_result.get('citations', [])[:5]}")
+                self.logger.info("Найдено цитат: %s", citations_result.get('total_unique', 0))
             except Exception as e:
-                print(f" Ошибка извлечения цитат: {e}")
+                self.logger.error("Ошибка извлечения цитат: %s", e)
                 citations_result = {
                     'total_unique': 0,
                     'citations': [],
@@ -195,31 +236,26 @@ class SimpleAnalysisService:
                 }
 
             # 3. Поиск библиографии
-            print(" Шаг 3: Ищем раздел библиографии...")
+            self.logger.info("Шаг 3: Ищем раздел библиографии...")
             try:
                 bibliography_blocks = self.bibliography_checker.find_bibliography_section(
                     document.main_content or []
                 )
-                print(f" Найдено библиографических записей: {len(bibliography_blocks)}")
+                self.logger.info("Найдено библиографических записей: %s", len(bibliography_blocks))
             except Exception as e:
-                print(f" Ошибка поиска библиографии: {e}")
+                self.logger.error("Ошибка поиска библиографии: %s", e)
                 bibliography_blocks = []
 
             # 4. Создаем библиографические записи как простые словари
-            print(" Шаг 4: Создаем библиографические записи...")
+            self.logger.info("Шаг 4: Создаем библиографические записи...")
             bibliography_entries = self._create_bibliography_entries(bibliography_blocks)
 
             # 5. Поиск в локальной библиотеке
-            print(" Шаг 5: Поиск в локальной библиотеке...")
+            self.logger.info("Шаг 5: Поиск в локальной библиотеке...")
             try:
-                enhanced_entries = []
-
+                # Обновляем словари записей на месте, без промежуточных BibliographyEntry
                 for entry in bibliography_entries:
-                    # Создаем объект записи
-                    from app.models.data_models import BibliographyEntry
-                    bib_entry = BibliographyEntry(**entry)
-
-                    print(f"\n   Ищем в библиотеке для: {entry['text'][:100]}...")
+                    self.logger.debug("Ищем в библиотеке для: %.100s...", entry['text'])
 
                     library_match = self.bibliography_checker._search_in_library(
                         entry['text'],
@@ -227,42 +263,24 @@ class SimpleAnalysisService:
                     )
 
                     if library_match:
-                        print(f"   Найдено совпадение!")
-                        bib_entry.library_match = library_match
-                        bib_entry.is_verified = True
-                        bib_entry.enhancement_confidence = library_match.get('match_score', 0) / 100
+                        self.logger.debug("Найдено совпадение!")
+                        entry['library_match'] = self._ensure_serializable(library_match)
+                        entry['is_verified'] = True
+                        entry['enhancement_confidence'] = library_match.get('match_score', 0) / 100
                     else:
-                        print(f"   Совпадений не найдено")
-
-                    enhanced_entries.append(bib_entry)
-
-                # Конвертируем обратно в словари
-                bibliography_entries = []
-                for entry in enhanced_entries:
-                    entry_dict = {
-                        'id': entry.id,
-                        'text': entry.text,
-                        'position': entry.position,
-                        'is_valid': entry.is_valid,
-                        'is_verified': entry.is_verified,
-                        'matched_citations': entry.matched_citations,
-                        'enhancement_confidence': entry.enhancement_confidence,
-                        'search_queries': entry.search_queries,
-                        'online_metadata': self._ensure_serializable(entry.online_metadata),
-                        'library_match': self._ensure_serializable(entry.library_match)
-                    }
-                    bibliography_entries.append(entry_dict)
+                        self.logger.debug("Совпадений не найдено")
+                        entry['library_match'] = {}
+
+                    entry['online_metadata'] = self._ensure_serializable(entry.get('online_metadata') or {})
 
                 matched_count = sum(1 for e in bibliography_entries if e.get('library_match'))
-                print(f"\n Поиск завершен. Найдено совпадений: {matched_count} из {len(bibliography_entries)}")
+                self.logger.info("Поиск завершен. Найдено совпадений: %s из %s", matched_count, len(bibliography_entries))
 
             except Exception as e:
-                print(f" Ошибка при поиске в библиотеке: {e}")
-                import traceback
-                traceback.print_exc()
+                self.logger.exception("Ошибка при поиске в библиотеке: %s", e)
 
             # 6. Проверка соответствия
-            print(" Шаг 6: Проверяем соответствие цитат и библиографии...")
+            self.logger.info("Шаг 6: Проверяем соответствие цитат и библиографии...")
             try:
                 if bibliography_blocks:
                     validation_result = self.bibliography_checker.check_citations_vs_bibliography(
@@ -283,7 +301,7 @@ class SimpleAnalysisService:
                         'bibliography_found': False
                     }
             except Exception as e:
-                print(f" Ошибка проверки соответствия: {e}")
+                self.logger.error("Ошибка проверки соответствия: %s", e)
                 validation_result = {
                     'valid_references': [],
                     'missing_references': [],
@@ -293,15 +311,15 @@ class SimpleAnalysisService:
                 }
 
             # 7. Собираем все источники с контентом
-            print(" Шаг 7: Собираем контент источников для дополнительных проверок...")
+            self.logger.info("Шаг 7: Собираем контент источников для дополнительных проверок...")
             try:
                 # ИСПРАВЛЕНИЕ: Используем run_until_complete с нашим loop
                 source_contents = self.loop.run_until_complete(
                     self._get_all_source_contents_async("demo_user")
                 )
-                print(f"   Получено источников с контентом: {len(source_contents)}")
+                self.logger.info("Получено источников с контентом: %s", len(source_contents))
             except Exception as e:
-                print(f"   Ошибка при получении контента источников: {e}")
+                self.logger.error("Ошибка при получении контента источников: %s", e)
                 source_contents = {}
 
             # Создаем словарь соответствия номеров цитат и ID источников
@@ -315,10 +333,10 @@ class SimpleAnalysisService:
                         except:
                             pass
 
-            print(f"   Найдено соответствий библиографии с источниками: {len(bibliography_matches)}")
+            self.logger.info("Найдено соответствий библиографии с источниками: %s", len(bibliography_matches))
 
             # 8. Проверка на некорректные ссылки
-            print(" Шаг 8: Проверка некорректных ссылок...")
+            self.logger.info("Шаг 8: Проверка некорректных ссылок...")
             misreference_issues = []
             try:
                 misreference_issues = self.misreference_checker.check_misreferences(
@@ -326,14 +344,12 @@ class SimpleAnalysisService:
                     bibliography_entries,
                     source_contents
                 )
-                print(f"   Найдено некорректных ссылок: {len(misreference_issues)}")
+                self.logger.info("Найдено некорректных ссылок: %s", len(misreference_issues))
             except Exception as e:
-                print(f"   Ошибка при проверке некорректных ссылок: {e}")
-                import traceback
-                traceback.print_exc()
+                self.logger.exception("Ошибка при проверке некорректных ссылок: %s", e)
 
             # 9. Проверка отсутствующих в источнике цитат
-            print(" Шаг 9: Проверка отсутствующих в источнике цитат...")
+            self.logger.info("Шаг 9: Проверка отсутствующих в источнике цитат...")
             missing_citation_issues = []
             try:
                 missing_citation_issues = self.missing_citation_checker.check_missing_citations(
@@ -341,14 +357,12 @@ class SimpleAnalysisService:
                     source_contents,
                     bibliography_matches
                 )
-                print(f"   Найдено отсутствующих цитат: {len(missing_citation_issues)}")
+                self.logger.info("Найдено отсутствующих цитат: %s", len(missing_citation_issues))
             except Exception as e:
-                print(f"   Ошибка при проверке отсутствующих цитат: {e}")
-                import traceback
-                traceback.print_exc()
+                self.logger.exception("Ошибка при проверке отсутствующих цитат: %s", e)
 
             # 10. Поиск цитат без ссылок
-            print(" Шаг 10: Поиск цитат без ссылок...")
+            self.logger.info("Шаг 10: Поиск цитат без ссылок...")
             unreferenced_issues = []
             try:
                 # Преобразуем источники в нужный формат
@@ -368,11 +382,9 @@ class SimpleAnalysisService:
                     source_list,
                     citations_result.get('details', [])
                 )
-                print(f"   Найдено цитат без ссылок: {len(unreferenced_issues)}")
+                self.logger.info("Найдено цитат без ссылок: %s", len(unreferenced_issues))
             except Exception as e:
-                print(f"   Ошибка при поиске цитат без ссылок: {e}")
-                import traceback
-                traceback.print_exc()
+                self.logger.exception("Ошибка при поиске цитат без ссылок: %s", e)
 
             # 11. Объединяем все проблемы
             all_issues = []
@@ -402,7 +414,7 @@ class SimpleAnalysisService:
             all_issues.extend(unreferenced_issues)
 
             # 12. Формируем результат
-            print(" Шаг 11: Формируем результат...")
+            self.logger.info("Шаг 11: Формируем результат...")
             try:
                 analysis_result = self._format_enhanced_result(
                     doc_id,
@@ -419,18 +431,17 @@ class SimpleAnalysisService:
                 )
 
                 end_time = time.time()
-                print(f"Анализ завершен за {end_time - start_time:.2f} секунд")
-                print(f"Результат: {len(analysis_result.get('citations', []))} цитат, "
-                      f"{len(analysis_result.get('bibliography_entries', []))} источников, "
-                      f"{len(all_issues)} проблем")
+                self.logger.info("Анализ завершен за %.2f секунд", end_time - start_time)
+                self.logger.info("Результат: %s цитат, %s источников, %s проблем",
+                                 len(analysis_result.get('citations', [])),
+                                 len(analysis_result.get('bibliography_entries', [])),
+                                 len(all_issues))
 
                 self.analysis_results[doc_id] = analysis_result
                 return analysis_result
 
             except Exception as e:
-                print(f" Ошибка форматирования результата: {e}")
-                import traceback
-                traceback.print_exc()
+                self.logger.exception("Ошибка форматирования результата: %s", e)
 
                 result = {
                     'doc_id': doc_id,
@@ -448,9 +459,7 @@ class SimpleAnalysisService:
                 return result
 
         except Exception as e:
-            print(f" КРИТИЧЕСКАЯ ОШИБКА В analyze_document: {e}")
-            import traceback
-            traceback.print_exc()
+            self.logger.exception("КРИТИЧЕСКАЯ ОШИБКА В analyze_document: %s", e)
 
             error_result = {
                 'doc_id': doc_id,
@@ -467,13 +476,21 @@ class SimpleAnalysisService:
             self.analysis_results[doc_id] = error_result
             return error_result
 
-    async def _verify_citation_against_source_async(self, citation: Dict, source: Dict) -> Dict[str, Any]:
+    async def _verify_citation_against_source_async(self, citation: Dict, source: Dict,
+                                                    source_contents: Optional[Dict[str, Optional[str]]] = None
+                                                    ) -> Dict[str, Any]:
         """Асинхронная проверка цитаты против конкретного источника"""
         try:
-            # Получаем полный текст источника через правильный метод
-            content_result = await library_service.get_source_content("demo_user", source['id'])
+            # Получаем полный текст источника: из кэша текущей проверки (source_contents), иначе через сервис
+            if source_contents is not None and source['id'] in source_contents:
+                source_content = source_contents[source['id']]
+            else:
+                content_result = await library_service.get_source_content("demo_user", source['id'])
+                source_content = content_result['content'] if content_result['success'] else None
+                if source_contents is not None:
+                    source_contents[source['id']] = source_content
 
-            if not content_result['success'] or not content_result['content']:
+            if not source_content:
                 return {
                     'verified': False,
                     'confidence': 0,
@@ -482,8 +499,6 @@ class SimpleAnalysisService:
                     'reason': 'Текст источника недоступен'
                 }
 
-            source_content = content_result['content']
-
             # Создаем данные для семантического анализа
             citation_data = {
                 'text': citation.get('text', ''),
@@ -499,8 +514,9 @@ class SimpleAnalysisService:
             }
 
             # Выполняем семантическую проверку
-            result = self.semantic_matcher.verify_citation_in_source(
-                citation_data, source_data
+            # Разбор и сравнение текстов - CPU-работа, выполняем в пуле потоков, не блокируя event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                _semantic_check_pool, self.semantic_matcher.verify_citation_in_source, citation_data, source_data
             )
 
             return {
@@ -535,17 +551,10 @@ class SimpleAnalysisService:
             return None
 
     def _ensure_serializable(self, data: Any) -> Any:
-        """Обеспечивает сериализуемость данных"""
+        """Обеспечивает сериализуемость данных (обход структуры - в orjson, неизвестные типы - в строку)"""
         if data is None:
             return {}
-        if isinstance(data, dict):
-            return {k: self._ensure_serializable(v) for k, v in data.items()}
-        if isinstance(data, list):
-            return [self._ensure_serializable(item) for item in data]
-        if isinstance(data, (str, int, float, bool)):
-            return data
-        # Конвертируем любые другие типы в строку
-        return str(data)
+        return orjson.loads(orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS))
 
     def _create_bibliography_entries(self, bibliography_blocks: List[TextBlock]) -> List[Dict[str, Any]]:
         """Создает библиографические записи как простые словари"""
@@ -569,11 +578,11 @@ class SimpleAnalysisService:
         return entries
 
     def _update_bibliography_with_matches(self, bibliography_entries: List[Dict], validation_result: Dict) -> List[Dict]:
-        valid_refs = set(validation_result.get('valid_references', []))
+        valid_refs = frozenset(validation_result.get('valid_references', ()))
 
-        print(f"ПРОВЕРКА СООТВЕТСТВИЯ БИБЛИОГРАФИИ И ЦИТАТ")
-        print(f"   Валидные цитаты: {sorted(valid_refs)}")
-        print(f"   Всего записей библиографии: {len(bibliography_entries)}")
+        self.logger.info("ПРОВЕРКА СООТВЕТСТВИЯ БИБЛИОГРАФИИ И ЦИТАТ")
+        self.logger.debug("Валидные цитаты: %s", sorted(valid_refs))
+        self.logger.debug("Всего записей библиографии: %s", len(bibliography_entries))
 
         # Сбрасываем статусы
         for entry in bibliography_entries:
@@ -585,28 +594,28 @@ class SimpleAnalysisService:
         entry_number_mapping = {}
         total_entries = len(bibliography_entries)
 
-        print(f"   СОЗДАЕМ СООТВЕТСТВИЯ (1..{total_entries}):")
+        self.logger.debug("СОЗДАЕМ СООТВЕТСТВИЯ (1..%s):", total_entries)
         for i in range(total_entries):
             number = str(i + 1)
             entry_number_mapping[number] = bibliography_entries[i]
-            print(f"      Номер {number} -> Запись #{i + 1}")
+            self.logger.debug("Номер %s -> Запись #%s", number, i + 1)
 
         # Сопоставляем цитаты с записями
         matched_count = 0
         for ref in valid_refs:
-            print(f"   Сопоставляем цитату '[{ref}]'...")
+            self.logger.debug("Сопоставляем цитату '[%s]'...", ref)
             if ref in entry_number_mapping:
                 entry = entry_number_mapping[ref]
                 entry['matched_citations'].append(ref)
                 entry['is_valid'] = True
                 matched_count += 1
-                print(f"      Цитата [{ref}] -> Запись #{bibliography_entries.index(entry) + 1}")
+                # Номер записи и есть номер цитаты (записи нумеруются 1..N) - без поиска по списку
+                self.logger.debug("Цитата [%s] -> Запись #%s", ref, ref)
             else:
-                print(f"      Цитата [{ref}] выходит за пределы библиографии (1..{total_entries})")
+                self.logger.debug("Цитата [%s] выходит за пределы библиографии (1..%s)", ref, total_entries)
 
-        # Статистика
-        valid_count = len([e for e in bibliography_entries if e['is_valid']])
-        print(f"ИТОГ: {valid_count} из {total_entries} записей используются")
+        # Статистика: номера уникальны и записи 1..N, так что каждое совпадение - отдельная запись
+        self.logger.info("ИТОГ: %s из %s записей используются", matched_count, total_entries)
 
         return bibliography_entries
 
@@ -614,8 +623,7 @@ class SimpleAnalysisService:
                               validation_result: Dict, bibliography_entries: List[Dict]) -> Dict[str, Any]:
         """Форматирует результат как простой словарь"""
 
-        print(f"\n{'=' * 80}")
-        print(" ФОРМИРОВАНИЕ ЦИТАТ ДЛЯ ФРОНТЕНДА:")
+        self.logger.info("ФОРМИРОВАНИЕ ЦИТАТ ДЛЯ ФРОНТЕНДА:")
 
         # Получаем details
         details_data = citations_result.get('details', [])
@@ -624,7 +632,7 @@ class SimpleAnalysisService:
         citations = []
 
         if isinstance(details_data, list):
-            print(f"   Найдено {len(details_data)} детализированных записей о цитатах")
+            self.logger.debug("Найдено %s детализированных записей о цитатах", len(details_data))
 
             for i, detail in enumerate(details_data):
                 if not isinstance(detail, dict):
@@ -634,7 +642,7 @@ class SimpleAnalysisService:
 
                 # ====== ФИЛЬТР: игнорируем невалидные цитаты ======
                 if not citation_num.isdigit():
-                    print(f"   Пропускаем не-цифровую цитату: [{citation_num}]")
+                    self.logger.debug("Пропускаем не-цифровую цитату: [%s]", citation_num)
                     continue
 
                 # ====== Получаем данные о цитате ======
@@ -656,29 +664,36 @@ class SimpleAnalysisService:
                     # Ищем цитату в тексте
                     citation_marker = f"[{citation_num}]"
 
-                    # Пробуем найти предложение с цитатой
-                    sentences = re.split(r'(?<=[.!?])\s+', full_paragraph)
-
-                    for sentence in sentences:
-                        if citation_marker in sentence:
-                            # Очищаем предложение
-                            clean_sentence = sentence.strip()
-
-                            # Если слишком длинное, обрезаем
-                            if len(clean_sentence) > 300:
-                                # Находим позицию цитаты
-                                pos = clean_sentence.find(citation_marker)
-                                start = max(0, pos - 150)
-                                end = min(len(clean_sentence), pos + len(citation_marker) + 150)
-                                clean_sentence = clean_sentence[start:end]
-                                if start > 0:
-                                    clean_sentence = '...' + clean_sentence
-                                if end < len(sentence):
-                                    clean_sentence = clean_sentence + '...'
-
-                            citation_text = clean_sentence
-                            context_text = full_paragraph[:500] + '...' if len(full_paragraph) > 500 else full_paragraph
-                            break
+                    # Пробуем найти предложение с цитатой: границы ищем вокруг первого вхождения маркера,
+                    # не разбивая весь абзац (маркер не содержит ни . ! ?, ни пробелов - границу он не пересекает)
+                    marker_pos = full_paragraph.find(citation_marker)
+                    sentence = None
+                    if marker_pos != -1:
+                        sentence_start = 0
+                        for boundary in _SENTENCE_BOUNDARY_RE.finditer(full_paragraph, 0, marker_pos):
+                            sentence_start = boundary.end()
+                        boundary = _SENTENCE_BOUNDARY_RE.search(full_paragraph, marker_pos + len(citation_marker))
+                        sentence_end = boundary.start() if boundary else len(full_paragraph)
+                        sentence = full_paragraph[sentence_start:sentence_end]
+
+                    if sentence is not None:
+                        # Очищаем предложение
+                        clean_sentence = sentence.strip()
+
+                        # Если слишком длинное, обрезаем
+                        if len(clean_sentence) > 300:
+                            # Находим позицию цитаты
+                            pos = clean_sentence.find(citation_marker)
+                            start = max(0, pos - 150)
+                            end = min(len(clean_sentence), pos + len(citation_marker) + 150)
+                            clean_sentence = clean_sentence[start:end]
+                            if start > 0:
+                                clean_sentence = '...' + clean_sentence
+                            if end < len(sentence):
+                                clean_sentence = clean_sentence + '...'
+
+                        citation_text = clean_sentence
+                        context_text = full_paragraph[:500] + '...' if len(full_paragraph) > 500 else full_paragraph
                     else:
                         # Если не нашли цитату в конкретном предложении, берем начало абзаца
                         if len(full_paragraph) > 100:
@@ -693,7 +708,7 @@ class SimpleAnalysisService:
                     if contexts and len(contexts) > 0:
                         context_text = contexts[0]
                         # Извлекаем предложение из контекста
-                        sentences = re.split(r'(?<=[.!?])\s+', context_text)
+                        sentences = _SENTENCE_BOUNDARY_RE.split(context_text, maxsplit=1)
                         if sentences:
                             citation_text = sentences[0][:200] + '...' if len(sentences[0]) > 200 else sentences[0]
 
@@ -708,9 +723,9 @@ class SimpleAnalysisService:
                     'citation_number': int(citation_num)
                 })
 
-                print(f"   Цитата [{citation_num}]: '{citation_text[:80]}...'")
+                self.logger.debug("Цитата [%s]: '%.80s...'", citation_num, citation_text)
 
-        print(f" Сформировано {len(citations)} валидных цитат")
+        self.logger.info("Сформировано %s валидных цитат", len(citations))
 
         # ====== Вычисляем статистику ======
         total_citations = len(citations)
@@ -718,13 +733,16 @@ class SimpleAnalysisService:
 
         completeness_score = valid_count / max(1, total_citations) if total_citations > 0 else 0.0
 
+        # Используемые записи считаем за один проход, неиспользуемые - разность
+        valid_entries_count = sum(1 for e in bibliography_entries if e.get('is_valid', False))
+
         summary = {
             "total_references": total_citations,
             "missing_references": len(validation_result.get('missing_references', [])),
-            "unused_references": len([e for e in bibliography_entries if not e.get('is_valid', False)]),
+            "unused_references": len(bibliography_entries) - valid_entries_count,
             "duplicate_references": 0,
             "bibliography_entries": len(bibliography_entries),
-            "valid_bibliography_entries": len([e for e in bibliography_entries if e.get('is_valid', False)]),
+            "valid_bibliography_entries": valid_entries_count,
             "completeness_score": round(completeness_score * 100, 2)
         }
 
@@ -741,7 +759,6 @@ class SimpleAnalysisService:
             'error_message': None
         }
 
-        print(f"{'=' * 80}\n")
         return result
 
     def get_analysis_result(self, doc_id: str) -> Optional[Dict[str, Any]]:
@@ -808,6 +825,8 @@ class SimpleAnalysisService:
 
         enhanced_citations = []
         processed_count = 0
+        # Тексты источников загружаются один раз на проверку, а не для каждой пары цитата-источник
+        source_contents = {}
 
         # Для каждой цитаты ищем семантические совпадения в источниках
         for citation in analysis_result['citations']:
@@ -816,12 +835,29 @@ class SimpleAnalysisService:
 
             print(f" Проверка цитаты {processed_count}/{len(analysis_result['citations'])}")
 
-            # Проверяем в каждом источнике
-            for source in user_sources:
-                if True:  # Проверяем все источники, даже если has_content=False
+            # Проверяем источники (даже если has_content=False - пытаемся получить контент).
+            # Пока векторизатор TF-IDF не обучен, источники проверяются по одному: словарь фиксируется
+            # по первой паре текстов и не должен зависеть от того, какой поток успеет первым.
+            # Затем оставшиеся источники проверяются параллельно; результаты разбираем в порядке источников:
+            # берется первый подтвержденный, как при переборе по одному, а еще не выполненные проверки отменяются
+            tasks = {}
+            try:
+                for index, source in enumerate(user_sources):
+                    if not tasks and self.semantic_matcher.is_vectorizer_fitted():
+                        tasks = {
+                            later: asyncio.create_task(
+                                self._verify_citation_against_source_async(citation, user_sources[later],
+                                                                           source_contents)
+                            )
+                            for later in range(index, len(user_sources))
+                        }
                     try:
-                        # Пытаемся получить контент, даже если флаг False
-                        verification_result = await self._verify_citation_against_source_async(citation, source)
+                        if index in tasks:
+                            verification_result = await tasks[index]
+                        else:
+                            verification_result = await self._verify_citation_against_source_async(
+                                citation, source, source_contents
+                            )
 
                         if verification_result['verified']:
                             citation_verifications.append(verification_result)
@@ -829,6 +865,9 @@ class SimpleAnalysisService:
                     except Exception as e:
                         print(f"Ошибка при проверке источника {source.get('id')}: {e}")
                         continue
+            finally:
+                for task in tasks.values():
+                    task.cancel()
 
             # Добавляем информацию о верификации к цитате
             citation['semantic_verifications'] = citation_verifications
@@ -2,13 +2,72 @@ import os
 import re
 import uuid
 import asyncio
+import multiprocessing
 from datetime import datetime
 from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import tempfile
 
 from app.document_parser.universal_parser import UniversalDocumentParser
 
+# Служебные символы в начале заголовка (тире, точки, нумерация)
+_TITLE_JUNK_CHARS = frozenset('–—-.')
+_TITLE_LEADING_JUNK_RE = re.compile(r'^[–—\-\s\d\.]+')
+
+
+# Файлы больше этого размера разбираются в пуле процессов (разбор PDF/DOCX упирается в CPU и держит GIL),
+# меньшие - в потоке: для них запуск процесса и передача результата дороже самого разбора
+PROCESS_PARSE_MIN_BYTES = 512 * 1024
+PARSE_POOL_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_parse_pool = None
+_worker_parser = None
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """Общий пул процессов для разбора документов (создается при первом большом файле)"""
+    global _parse_pool
+    if _parse_pool is None:
+        # spawn, а не fork: в процессе сервера уже работают потоки (to_thread, соединение SQLite)
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_POOL_MAX_WORKERS,
+                                          mp_context=multiprocessing.get_context('spawn'))
+    return _parse_pool
+
+
+def _discard_parse_pool(pool: ProcessPoolExecutor = None):
+    """Закрывает пул процессов (если передан pool - только если он еще текущий); следующий большой файл создаст новый"""
+    global _parse_pool
+    if _parse_pool is None or (pool is not None and _parse_pool is not pool):
+        return
+    pool, _parse_pool = _parse_pool, None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_parse_pool():
+    """Останавливает пул процессов разбора (при остановке приложения)"""
+    _discard_parse_pool()
+
+
+def _parse_document_in_worker(file_path: str):
+    """Разбор документа в процессе пула (парсер создается один раз на процесс)"""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = UniversalDocumentParser()
+    return _worker_parser.parse_document(file_path)
+
+
+def _split_author_candidates(authors_part: str) -> List[str]:
+    """Делит строку авторов по запятым/точкам с запятой и союзу " и " (через str.split, без regex)"""
+    candidates = []
+    for comma_part in authors_part.replace(';', ',').split(','):
+        for candidate in comma_part.split(' и '):
+            candidate = ' '.join(candidate.split())
+            if len(candidate) > 3:
+                candidates.append(candidate)
+    return candidates
+
 
 class SimpleSourceProcessor:
     """Улучшенный процессор для извлечения текста и метаданных из файлов источников"""
@@ -114,7 +173,7 @@ class SimpleSourceProcessor:
             if file_extension in ['.pdf', '.doc', '.docx', '.rtf']:
                 # Для поддерживаемых форматов используем UniversalDocumentParser
                 print(f"Using UniversalDocumentParser for {file_extension}")
-                document = self.document_parser.parse_document(str(file_path))
+                document = await self._parse_document(file_path)
 
                 if not document:
                     print("Document parser returned None")
@@ -151,6 +210,19 @@ class SimpleSourceProcessor:
             traceback.print_exc()
             return f"[Error extracting text: {str(e)}]"
 
+    async def _parse_document(self, file_path: Path):
+        """Разбирает документ вне event loop: крупные файлы - в пуле процессов, мелкие - в потоке"""
+        if Path(file_path).stat().st_size >= PROCESS_PARSE_MIN_BYTES:
+            pool = _get_parse_pool()
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(pool, _parse_document_in_worker, str(file_path))
+            except BrokenProcessPool as e:
+                # Ошибки самого разбора пробрасываются как есть; здесь - только упавший пул
+                print(f"Process pool parsing failed, falling back to thread: {e}")
+                _discard_parse_pool(pool)
+        return await asyncio.to_thread(self.document_parser.parse_document, str(file_path))
+
     def _extract_text_from_document(self, document) -> str:
         """Извлекает текст из документа UniversalDocumentParser"""
         try:
@@ -318,11 +390,7 @@ class SimpleSourceProcessor:
                 if len(parts) > 1:
                     authors_part = parts[1].strip()
                     # Разделяем нескольких авторов
-                    author_candidates = re.split(r'[;,и]', authors_part)
-                    for candidate in author_candidates:
-                        candidate = candidate.strip()
-                        if candidate and len(candidate) > 3:
-                            authors.append(candidate)
+                    authors.extend(_split_author_candidates(authors_part))
 
         # 3. Убираем дубли
         unique_authors = []
@@ -469,9 +537,9 @@ class SimpleSourceProcessor:
             return True
 
         # Начинается со знака препинания или цифры
-        if re.match(r'^[–—\-\.\d\s]', line):
+        if line[:1] in _TITLE_JUNK_CHARS or line[:1].isspace() or line[:1].isdigit():
             # Исключение: если это тире перед заголовком
-            clean_line = re.sub(r'^[–—\-\.\d\s]+', '', line)
+            clean_line = _TITLE_LEADING_JUNK_RE.sub('', line)
             if len(clean_line) < 10:
                 return True
 
@@ -528,11 +596,14 @@ class SimpleSourceProcessor:
 
     def _clean_title(self, title: str) -> str:
         """Очищает заголовок от мусора"""
-        # Убираем служебные символы в начале
-        clean_title = re.sub(r'^[–—\-\s\d\.]+', '', title).strip()
+        # Убираем служебные символы в начале (регулярное выражение - только если есть что убирать)
+        clean_title = title
+        if clean_title[:1] in _TITLE_JUNK_CHARS or clean_title[:1].isspace() or clean_title[:1].isdigit():
+            clean_title = _TITLE_LEADING_JUNK_RE.sub('', clean_title)
+        clean_title = clean_title.strip()
 
         # Убираем лишние пробелы
-        clean_title = re.sub(r'\s+', ' ', clean_title)
+        clean_title = ' '.join(clean_title.split())
 
         # Убираем кавычки по краям если они есть
         if (clean_title.startswith('"') and clean_title.endswith('"')) or \
@@ -554,7 +625,7 @@ class SimpleSourceProcessor:
                 clean_name = clean_name.replace(sep, ' ')
 
             # Убираем повторяющиеся пробелы
-            clean_name = re.sub(r'\s+', ' ', clean_name).strip()
+            clean_name = ' '.join(clean_name.split())
 
             # Если имя слишком короткое или содержит только цифры
             if not clean_name or len(clean_name) < 3 or re.match(r'^[\d\W]+$', clean_name):
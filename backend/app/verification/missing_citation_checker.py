@@ -177,10 +177,10 @@ class MissingCitationChecker:
         """Проверяет совпадение после очистки текста"""
         # Убираем знаки препинания, лишние пробелы, приводим к нижнему регистру
         citation_clean = re.sub(r'[^\w\s]', '', citation.lower())
-        citation_clean = re.sub(r'\s+', ' ', citation_clean).strip()
+        citation_clean = ' '.join(citation_clean.split())
 
         source_clean = re.sub(r'[^\w\s]', '', source.lower())
-        source_clean = re.sub(r'\s+', ' ', source_clean).strip()
+        source_clean = ' '.join(source_clean.split())
 
         if citation_clean in source_clean:
             return {
@@ -232,8 +232,8 @@ class MissingCitationChecker:
             text1_clean = re.sub(r'[^\w\s]', ' ', text1.lower())
             text2_clean = re.sub(r'[^\w\s]', ' ', text2.lower())
 
-            text1_clean = re.sub(r'\s+', ' ', text1_clean).strip()
-            text2_clean = re.sub(r'\s+', ' ', text2_clean).strip()
+            text1_clean = ' '.join(text1_clean.split())
+            text2_clean = ' '.join(text2_clean.split())
 
             # Если тексты слишком короткие, используем другой метод
             if len(text1_clean.split()) < 5 or len(text2_clean.split()) < 5:
@@ -274,14 +274,14 @@ class MissingCitationChecker:
 
         for c_sent in citation_sentences:
             c_sent_clean = re.sub(r'[^\w\s]', '', c_sent.lower())
-            c_sent_clean = re.sub(r'\s+', ' ', c_sent_clean).strip()
+            c_sent_clean = ' '.join(c_sent_clean.split())
 
             if len(c_sent_clean) < 20:  # Слишком короткие предложения пропускаем
                 continue
 
             for s_sent in source_sentences:
                 s_sent_clean = re.sub(r'[^\w\s]', '', s_sent.lower())
-                s_sent_clean = re.sub(r'\s+', ' ', s_sent_clean).strip()
+                s_sent_clean = ' '.join(s_sent_clean.split())
 
                 if c_sent_clean in s_sent_clean or s_sent_clean in c_sent_clean:
                     matches.append({
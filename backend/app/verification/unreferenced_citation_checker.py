@@ -595,7 +595,7 @@ class UnreferencedCitationChecker:
     def _create_shingles(self, text: str, n: int) -> Set[str]:
         """Создает набор шинглов из текста"""
         text = re.sub(r'[^\w\s]', ' ', text.lower())
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = ' '.join(text.split())
 
         words = text.split()
         shingles = set()